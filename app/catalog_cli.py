@@ -0,0 +1,66 @@
+"""Bulk catalog import/export against the configured database (same env vars as the API).
+
+    python -m app.catalog_cli import courses.ndjson      # or "-" / nothing for stdin
+    python -m app.catalog_cli export > courses.ndjson
+"""
+import argparse
+import asyncio
+import sys
+from typing import AsyncIterator, BinaryIO
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app.config.settings import close_settings, init_settings, open_db
+from app.service import catalog_service
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+async def _read_chunks(src: BinaryIO) -> AsyncIterator[bytes]:
+    while chunk := await run_in_threadpool(src.read, READ_CHUNK_SIZE):
+        yield chunk
+
+
+async def _import(app: FastAPI, path: str) -> int:
+    src = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        async with open_db(app) as db:
+            result = await catalog_service.import_courses(catalog_service.ndjson_lines(_read_chunks(src)), db)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+    print(result.model_dump_json(indent=2), file=sys.stderr)
+    return 1 if result.failed else 0
+
+
+async def _export(app: FastAPI) -> int:
+    out = sys.stdout.buffer
+    async for chunk in catalog_service.export_courses(app):
+        out.write(chunk)
+    out.flush()
+    return 0
+
+
+async def _main(args: argparse.Namespace) -> int:
+    app = FastAPI()
+    await init_settings(app)
+    try:
+        if args.command == "import":
+            return await _import(app, args.path)
+        return await _export(app)
+    finally:
+        await close_settings(app)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.catalog_cli", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="import NDJSON courses; the summary goes to stderr")
+    import_cmd.add_argument("path", nargs="?", default="-", help="NDJSON file, '-' for stdin")
+    commands.add_parser("export", help="write the catalog as NDJSON to stdout")
+    return asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,169 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
+from typing import Callable, TypeVar
 
 from fastapi import FastAPI, Request
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from app.model.model import Base
+from app.util.cache import create_cache_backend
+from app.util.db_pool import PoolMetrics, MeteredQueuePool, MeteredAsyncQueuePool
 
+T = TypeVar("T")
 
-def init_settings(app: FastAPI):
-    init_db(app)
+DbSession = Session | AsyncSession
 
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
 
-def init_db(app: FastAPI):
+# Shared by every service cache; CACHE_URL=redis://... lets all workers share one cache
+cache_backend = create_cache_backend(os.getenv("CACHE_URL"), maxsize=int(os.getenv("CACHE_MAX_ENTRIES", "10000")))
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+async def init_settings(app: FastAPI):
+    await init_db(app)
+
+
+async def close_settings(app: FastAPI):
+    await cache_backend.close()
+    if app.state.DB_ASYNC:
+        await app.state.engine.dispose()
+    else:
+        app.state.engine.dispose()
+
+
+def _pool_options(db_url: str, use_async: bool) -> dict:
+    # In-memory SQLite keeps a single connection per thread; there is no queue to size.
+    if db_url.startswith("sqlite") and (":memory:" in db_url or db_url.rstrip("/") == "sqlite:"):
+        return {}
+    return {
+        "poolclass": MeteredAsyncQueuePool if use_async else MeteredQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING"),
+    }
+
+
+def _apply_sqlite_pragmas(engine):
+    busy_timeout = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+        cursor.close()
+
+
+def _async_url(db_url: str) -> str:
+    scheme, sep, rest = db_url.partition("://")
+    if "+" in scheme:
+        return db_url
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+async def init_db(app: FastAPI):
     db_url = os.getenv("DATABASE_URL", "sqlite:///./app.db")
-    connect_args = {"check_same_thread": False} if db_url.startswith("sqlite") else {}
-    engine = create_engine(db_url, future=True, echo=False, connect_args=connect_args)
-    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    use_async = env_flag("DB_ASYNC")
+    is_sqlite = db_url.startswith("sqlite")
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+    pool_options = _pool_options(db_url, use_async)
+
+    if use_async:
+        engine = create_async_engine(_async_url(db_url), echo=False, connect_args=connect_args, **pool_options)
+        sync_engine = engine.sync_engine
+    else:
+        engine = create_engine(db_url, future=True, echo=False, connect_args=connect_args, **pool_options)
+        sync_engine = engine
+
+    if is_sqlite:
+        _apply_sqlite_pragmas(sync_engine)
+    pool_metrics = PoolMetrics()
+    pool_metrics.attach(sync_engine.pool)
+
+    if use_async:
+        SessionLocal = async_sessionmaker(bind=engine, autoflush=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    else:
+        # One permit per pooled connection (see run_db); threads then never block waiting for the pool
+        capacity = pool_options["pool_size"] + pool_options["max_overflow"] if pool_options else None
+        info = {"permits": asyncio.Semaphore(capacity)} if capacity else {}
+        SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True, info=info)
+        Base.metadata.create_all(bind=engine)
 
     app.state.DATABASE_URL = db_url
+    app.state.DB_ASYNC = use_async
     app.state.engine = engine
     app.state.SessionLocal = SessionLocal
+    app.state.pool_metrics = pool_metrics
+
 
-    Base.metadata.create_all(bind=engine)
+def get_pool_stats(app: FastAPI) -> dict:
+    engine = app.state.engine.sync_engine if app.state.DB_ASYNC else app.state.engine
+    return app.state.pool_metrics.snapshot(engine.pool)
 
 
-def get_db(request: Request):
-    db = request.app.state.SessionLocal()
+@asynccontextmanager
+async def open_db(app: FastAPI):
+    """Session for work outside a request (background jobs, shutdown flushes)."""
+    db = app.state.SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await release_db(db)
+
+
+async def release_db(db: DbSession):
+    """End the session's transaction and hand its connection (and run_db permit) back to the pool.
+
+    The session stays usable; its next call checks a connection out again. For requests that
+    wait on something slow between two DB calls, such as a password hash.
+    """
+    if isinstance(db, AsyncSession):
+        await db.close()
+        return
+    try:
+        await run_in_threadpool(db.close)
+    finally:
+        if db.info.pop("has_permit", False):
+            db.info["permits"].release()
+
+
+async def get_db(request: Request):
+    async with open_db(request.app) as db:
+        yield db
+
+
+async def run_db(db: DbSession, fn: Callable[[Session], T]) -> T:
+    """Run a Session-based service call without blocking the event loop.
+
+    With the async engine the call runs through ``AsyncSession.run_sync`` so I/O
+    goes through the async driver; with the sync engine it runs in the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn)
+    # A sync session keeps its connection from its first call until close. Taking the permit here, on the
+    # event loop, bounds such sessions by the pool size: otherwise every threadpool thread can end up
+    # blocked in a pool checkout while the sessions holding the connections wait for a thread.
+    permits = db.info.get("permits")
+    if permits is not None and not db.info.get("has_permit"):
+        await permits.acquire()
+        db.info["has_permit"] = True
+    return await run_in_threadpool(fn, db)
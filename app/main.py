@@ -1,23 +1,39 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from starlette.middleware.cors import CORSMiddleware
 
-from app.config.settings import init_settings
+from app.config.settings import init_settings, close_settings, get_pool_stats, cache_backend
 from app.middleware.verify_middleware import VerifyTokenMiddleware
 from app.router import user, chat, course, watchlist, auth
+from app.service.course_service import course_cache, progress_buffer, start_progress_buffer, stop_progress_buffer
+from app.service import chat_service, dashboard_service, rating_service, recommendation_service, retrieval_service
+from app.service.search_service import ensure_search_index
+from app.service.tag_service import tag_index
+from app.service.user_service import profile_cache
 from app.util.log_time import log_time
 
 
 @asynccontextmanager
 async def lifespan(f: FastAPI):
     log_time("🔄:       Initializing application...")
-    init_settings(f)
+    await init_settings(f)
+    await ensure_search_index(f)
+    await retrieval_service.ensure_retrieval_index(f)
+    await start_progress_buffer(f)
+    recommendation_service.start_recommender(f)
+    dashboard_service.start_dashboard_job(f)
+    rating_service.start_rating_job(f)
     log_time("✅:       Startup complete. Global dependencies initialized.")
 
     yield
 
     log_time("⚠️:       Cleanup: Application is shutting down...")
+    await rating_service.stop_rating_job()
+    await dashboard_service.stop_dashboard_job()
+    await recommendation_service.stop_recommender()
+    await stop_progress_buffer()
+    await close_settings(f)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -36,3 +52,38 @@ app.include_router(watchlist.router, prefix='/watchlist')
 @app.get("/ping")
 async def ping():
     return {"ping": "pong!"}
+
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics(request: Request):
+    return get_pool_stats(request.app)
+
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    return {
+        "backend": cache_backend.stats(),
+        "courses": course_cache.stats(),
+        "profiles": profile_cache.stats(),
+        "tag_index": tag_index.stats(),
+    }
+
+
+@app.get("/metrics/progress-buffer")
+async def progress_buffer_metrics():
+    return {"enabled": progress_buffer is not None, **(progress_buffer.stats() if progress_buffer else {})}
+
+
+@app.get("/metrics/recommendations")
+async def recommendation_metrics():
+    return recommendation_service.stats()
+
+
+@app.get("/metrics/retrieval")
+async def retrieval_metrics():
+    return retrieval_service.stats()
+
+
+@app.get("/metrics/chat")
+async def chat_metrics():
+    return chat_service.stats()
@@ -1,17 +1,58 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+import hmac
+import os
+from typing import Iterable
+
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.websockets import WebSocketClose
+
+from app.util.security import verify_access_token
+
+# Static client token accepted while apps migrate to per-user tokens; disabled unless configured
+LEGACY_TOKEN = os.getenv("LEGACY_AUTH_TOKEN", "")
+
+PUBLIC_PATHS = frozenset({
+    "/ping",
+    "/auth/login",
+    "/user/create",
+    "/docs",
+    "/docs/oauth2-redirect",
+    "/redoc",
+    "/openapi.json",
+})
+
+
+def _extract_token(headers: Headers) -> str | None:
+    token = headers.get('auth-token')
+    if token:
+        return token
+    scheme, _, credentials = headers.get('authorization', '').partition(' ')
+    return credentials if scheme.lower() == 'bearer' else None
+
+
+class VerifyTokenMiddleware:
+    """Pure ASGI token check: no task or body-stream wrapping around the downstream app."""
+
+    def __init__(self, app: ASGIApp, public_paths: Iterable[str] = PUBLIC_PATHS):
+        self.app = app
+        self.public_paths = frozenset(public_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket") or scope["path"] in self.public_paths:
+            await self.app(scope, receive, send)
+            return
 
+        token = _extract_token(Headers(scope=scope))
+        claims = verify_access_token(token)
+        if claims:
+            scope.setdefault("state", {})["user_id"] = int(claims["sub"])
+        elif not (LEGACY_TOKEN and token and hmac.compare_digest(token.encode(), LEGACY_TOKEN.encode())):
+            if scope["type"] == "websocket":
+                response = WebSocketClose(code=1008)
+            else:
+                response = JSONResponse(status_code=403, content={"detail": "Invalid token"})
+            await response(scope, receive, send)
+            return
 
-class VerifyTokenMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
-        token_header = request.headers.get('Auth-token')
-        # TODO: improve token validation
-        expected_token = 'igxApoxPwT66sYBzenkEUf6YMtzk8Zh7'
-        if token_header != expected_token:
-            return JSONResponse(
-                status_code=403,
-                content={"detail": "Invalid token"}
-            )
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
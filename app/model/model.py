@@ -1,8 +1,9 @@
-from datetime import datetime
+import os
+from datetime import datetime, timedelta
 from typing import List
 
-from sqlalchemy import JSON, Integer, String, Boolean, Column, DateTime, func, ForeignKey, Enum, Text, Float, \
-    UniqueConstraint
+from sqlalchemy import JSON, BigInteger, Integer, String, Boolean, Column, DateTime, func, ForeignKey, Enum, Text, Float, \
+    UniqueConstraint, Index, DDL, event
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -35,10 +36,28 @@ class User(Base):
     )
 
 
+class UserDashboard(Base):
+    """Per-user totals over course_progress, kept up to date by the progress writes (see dashboard_service)."""
+    __tablename__ = "user_dashboard"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    in_progress = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    downloaded = Column(Integer, nullable=False, default=0)
+    # Sum of duration_seconds * progress / 100 over the user's courses
+    learning_seconds = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 # -------------------------------------------- COURSE --------------------------------------------
 CourseFormat = Enum("video", "xapi", "pdf", name="course_format")
 CourseType = Enum("self_paced", "instructor_led", name="course_type")
 
+# Course.updated_at is stamped by the app before commit. A write that commits late, or comes from a worker
+# whose clock lags, can land behind the newest updated_at a reader has already seen; readers that
+# watermark on it treat this much of the recent past as not yet settled.
+COURSE_LATE_COMMIT = timedelta(seconds=float(os.getenv("COURSE_LATE_COMMIT_SECONDS", "10")))
+
 
 class Course(Base):
     __tablename__ = "courses"
@@ -50,13 +69,18 @@ class Course(Base):
     format = Column(CourseFormat, nullable=False, default="video")
     course_type = Column(CourseType, nullable=False, default="self_paced")
     learning_goals = Column(JSON, nullable=True)
+    # Mean of course_ratings, maintained incrementally on every submission (see rating_service)
     rating_avg = Column(Float, nullable=False, default=0.0)
+    rating_count = Column(Integer, nullable=False, default=0)
     requires_certificate = Column(Boolean, nullable=False, default=False)
     title_image = Column(String)
     thumbnail_url = Column(String)
     download_url = Column(String)
+    file_sha256 = Column(String(64), nullable=True)
+    file_size = Column(BigInteger, nullable=True)
     is_downloaded = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     # was: uselist=False (wrong for per-user)
     progress_items = relationship(
@@ -67,6 +91,13 @@ class Course(Base):
 
     tags = relationship("CourseTag", back_populates="course", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_courses_created_at_id", "created_at", "id"),
+        Index("ix_courses_format_created_at", "format", "created_at"),
+        Index("ix_courses_course_type_created_at", "course_type", "created_at"),
+        Index("ix_courses_rating_avg_id", "rating_avg", "id"),
+    )
+
 
 class CourseProgress(Base):
     __tablename__ = "course_progress"
@@ -75,10 +106,26 @@ class CourseProgress(Base):
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)  # new
     progress = Column(Float, nullable=False, default=0.0)
     is_downloaded = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Time of the change on the device (server time for direct PATCHes); last writer wins on sync
+    client_updated_at = Column(DateTime, nullable=True)
 
     course = relationship("Course", back_populates="progress_items")
     user = relationship("User", back_populates="course_progress")
 
+    __table_args__ = (Index("ix_course_progress_user_updated_at", "user_id", "updated_at"),)
+
+
+class CourseRating(Base):
+    """One rating per user and course; submitting again replaces it."""
+    __tablename__ = "course_ratings"
+
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    rating = Column(Integer, nullable=False)  # 1..5
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
 
 class CourseTag(Base):
     __tablename__ = "course_tags"
@@ -86,7 +133,10 @@ class CourseTag(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
     tag = Column(String, nullable=False)
-    __table_args__ = (UniqueConstraint("course_id", "tag", name="uq_course_tag"),)
+    __table_args__ = (
+        UniqueConstraint("course_id", "tag", name="uq_course_tag"),
+        Index("ix_course_tags_tag_course_id", "tag", "course_id"),
+    )
     course = relationship("Course", back_populates="tags")
 
 
@@ -95,8 +145,70 @@ class Watchlist(Base):
     __tablename__ = "watchlist"
 
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, nullable=False, index=True)
-    course_id = Column(String, ForeignKey("courses.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     course = relationship("Course")
+
+    __table_args__ = (
+        # Also makes concurrent adds of the same course a no-op instead of a duplicate row
+        Index("ux_watchlist_user_course", "user_id", "course_id", unique=True),
+        Index("ix_watchlist_user_created_at", "user_id", "created_at", "id"),
+    )
+
+
+# -------------------------------------------- UPLOAD SESSION --------------------------------------------
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
+    file_name = Column(String, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    total_size = Column(BigInteger, nullable=True)
+    status = Column(String, nullable=False, default="open")  # open | completed
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    parts = relationship(
+        "UploadPart",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="UploadPart.part_number",
+    )
+
+
+class UploadPart(Base):
+    __tablename__ = "upload_parts"
+
+    upload_id = Column(String, ForeignKey("upload_sessions.id"), primary_key=True)
+    part_number = Column(Integer, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+
+    session = relationship("UploadSession", back_populates="parts")
+
+
+# -------------------------------------------- SEARCH INDEX --------------------------------------------
+# Full-text index over course text, keyed by courses.id and maintained by search_service.index_course.
+# SQLite uses an FTS5 table (rowid = course id); PostgreSQL a weighted tsvector with a GIN index.
+for _ddl in (
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS course_search USING fts5("
+        "title, tags, learning_goals, description, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ).execute_if(dialect="sqlite"),
+    # The index's terms, for expanding prefixes longer than the prefix index covers
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS course_search_terms USING fts5vocab(course_search, 'row')"
+    ).execute_if(dialect="sqlite"),
+    DDL(
+        "CREATE TABLE IF NOT EXISTS course_search ("
+        "course_id INTEGER PRIMARY KEY REFERENCES courses(id) ON DELETE CASCADE, "
+        "document TSVECTOR NOT NULL)"
+    ).execute_if(dialect="postgresql"),
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_course_search_document ON course_search USING GIN (document)"
+    ).execute_if(dialect="postgresql"),
+):
+    event.listen(Base.metadata, "after_create", _ddl)
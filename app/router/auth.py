@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
 
-from app.config.settings import get_db
+from app.config.settings import get_db, DbSession
 from app.service.auth_service import login_service
 
 router = APIRouter()
@@ -14,6 +13,6 @@ class SignInReq(BaseModel):
 
 
 @router.post('/login')
-async def login(body: SignInReq, db: Session = Depends(get_db)):
-    token = login_service(body.email, body.password, db)
+async def login(body: SignInReq, db: DbSession = Depends(get_db)):
+    token = await login_service(body.email, body.password, db)
     return token
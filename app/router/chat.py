@@ -1,10 +1,127 @@
-from fastapi import APIRouter
+import asyncio
+import json
+import weakref
+from contextlib import suppress
 
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from starlette.responses import StreamingResponse
+
+from app.config.settings import DbSession, get_db, open_db
+from app.schema.schema import ChatMessageIn
+from app.service import chat_service
 from app.service.chat_service import send_message_service
+from app.util.log_time import log_time
 
 router = APIRouter()
 
 
+def _user_key(conn: Request | WebSocket):
+    # Per-user tokens carry the user id; legacy-token clients are told apart by address
+    return conn.scope.get("state", {}).get("user_id") or (conn.client.host if conn.client else "anonymous")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sources(context: list) -> list[dict]:
+    return [{"id": c.id, "title": c.title} for c in context]
+
+
 @router.post('/send')
-async def send_message(body: dict):
-    return send_message_service(body['message'])
+async def send_message(body: ChatMessageIn, request: Request, db: DbSession = Depends(get_db)):
+    return await send_message_service(body.message, _user_key(request), db)
+
+
+@router.post('/stream')
+async def stream_message(body: ChatMessageIn, request: Request, db: DbSession = Depends(get_db)):
+    """Server-Sent Events: ``sources`` (the courses the answer draws on), one ``token`` per piece, then ``done``."""
+    slot = chat_service.acquire_chat_slot(_user_key(request))
+    try:
+        context = await chat_service.course_context(body.message, db)
+    except BaseException:
+        slot.release()
+        raise
+
+    async def events():
+        try:
+            yield _sse("sources", {"courses": _sources(context)})
+            async for token in chat_service.stream_message(body.message, context):
+                yield _sse("token", {"text": token})
+            yield _sse("done", {})
+        finally:
+            slot.release()
+
+    stream = events()
+    # The generator never starts if the client leaves before the first byte; free the slot anyway
+    weakref.finalize(stream, slot.release)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _cancel(task: asyncio.Task | None):
+    if task and not task.done():
+        task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+
+
+async def _answer(websocket: WebSocket, message: str):
+    async with open_db(websocket.app) as db:
+        context = await chat_service.course_context(message, db)
+    await websocket.send_json({"type": "sources", "courses": _sources(context)})
+    async for token in chat_service.stream_message(message, context):
+        await websocket.send_json({"type": "token", "text": token})
+    await websocket.send_json({"type": "done"})
+
+
+def _answer_done(task: asyncio.Task, slot):
+    slot.release()
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None and not isinstance(exc, WebSocketDisconnect):
+        log_time(f"⚠️:       Chat answer failed: {exc!r}")
+
+
+@router.websocket('/ws')
+async def chat_websocket(websocket: WebSocket):
+    """Send ``{"message": ...}``; tokens come back as they are produced. ``{"type": "cancel"}`` stops an answer."""
+    await websocket.accept()
+    user_key = _user_key(websocket)
+    answer: asyncio.Task | None = None
+    try:
+        while True:
+            try:
+                data = await websocket.receive_json()
+            except (ValueError, TypeError, KeyError):
+                # Not JSON, or a binary frame (no "text" in the message)
+                data = None
+            if not isinstance(data, dict):
+                await websocket.send_json({"type": "error", "status": 422, "detail": "Se espera un objeto JSON"})
+                continue
+            if data.get("type") == "cancel":
+                await _cancel(answer)
+                continue
+            if answer and not answer.done():
+                await websocket.send_json({"type": "error", "status": 409, "detail": "Ya hay una respuesta en curso"})
+                continue
+            message = str(data.get("message") or "").strip()
+            if not message:
+                await websocket.send_json({"type": "error", "status": 422, "detail": "message es obligatorio"})
+                continue
+            try:
+                slot = chat_service.acquire_chat_slot(user_key)
+            except HTTPException as exc:
+                await websocket.send_json({"type": "error", "status": exc.status_code, "detail": exc.detail})
+                continue
+            answer = asyncio.create_task(_answer(websocket, message))
+            answer.add_done_callback(lambda task, slot=slot: _answer_done(task, slot))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Client went away: stop generating instead of finishing an answer nobody reads
+        await _cancel(answer)
@@ -1,40 +1,130 @@
-from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, Response, Request, Path
 from starlette import status
+from starlette.responses import FileResponse, StreamingResponse
 
-from app.config.settings import get_db
+from app.config.settings import get_db, run_db, DbSession
 from app.schema.schema import CourseOut, CourseDownloadOut, CourseDetailResponse, CourseProgressOut, CourseProgressIn, \
-    CourseCreate, CourseDownloadStatusIn
-from app.service import course_service
+    CourseCreate, CourseDownloadStatusIn, FormatLiteral, CourseTypeLiteral, UploadSessionCreate, UploadSessionOut, \
+    UploadPartOut, CourseProgressSyncIn, CourseProgressSyncOut, CourseSearchHit, TagFacetsOut, CourseRecommendationOut, \
+    CourseImportOut, CourseRatingIn, CourseRatingOut
+from app.service import catalog_service, course_service, upload_service, search_service, tag_service, \
+    recommendation_service, rating_service
+from app.util.conditional import etag_matches, not_modified, validator_headers
 
 router = APIRouter()
 
 
+# Declared before "/{user_id}" so "search", "facets" and "export" are not taken for a user id
+@router.get("/search", response_model=list[CourseSearchHit])
+async def search(
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=50),
+        offset: int = Query(0, ge=0, le=1000),
+        prefix: bool = Query(True, description="Tratar la última palabra como prefijo (type-ahead)"),
+        db: DbSession = Depends(get_db),
+):
+    return await search_service.search_courses(q, db, limit=limit, offset=offset, prefix=prefix)
+
+
+@router.get("/facets/tags", response_model=TagFacetsOut)
+async def tag_facets(
+        format: Optional[FormatLiteral] = None,
+        course_type: Optional[CourseTypeLiteral] = None,
+        tag: Optional[str] = None,
+        requires_certificate: Optional[bool] = None,
+        min_rating: Optional[float] = Query(None, ge=0, le=5),
+        limit: Optional[int] = Query(None, ge=1, le=500),
+        db: DbSession = Depends(get_db),
+):
+    return await tag_service.tag_facets(
+        db, format=format, course_type=course_type, tag=tag, requires_certificate=requires_certificate,
+        min_rating=min_rating, limit=limit,
+    )
+
+
+@router.get("/export")
+async def export_courses(request: Request):
+    """The catalog as NDJSON (one CourseCreate object per line), streamed; feed it back to POST /course/import."""
+    return StreamingResponse(catalog_service.export_courses(request.app), media_type="application/x-ndjson")
+
+
 @router.get("/{user_id}", response_model=list[CourseDetailResponse])
-async def get_all(user_id: int, db: Session = Depends(get_db)):
-    courses = course_service.list_courses(db, user_id)
+async def get_all(
+        user_id: int,
+        request: Request,
+        response: Response,
+        cursor: Optional[int] = Query(None, description="ID del último curso de la página anterior"),
+        limit: Optional[int] = Query(None, ge=1, le=100),
+        order: Literal["asc", "desc"] = "asc",
+        format: Optional[FormatLiteral] = None,
+        course_type: Optional[CourseTypeLiteral] = None,
+        tag: Optional[str] = None,
+        requires_certificate: Optional[bool] = None,
+        min_rating: Optional[float] = Query(None, ge=0, le=5),
+        sort: Literal["created_at", "rating"] = "created_at",
+        db: DbSession = Depends(get_db),
+):
+    etag = await course_service.catalog_etag(db, user_id, request.url.query)
+    if cached := not_modified(request, etag):
+        return cached
+
+    courses, next_cursor = await course_service.list_courses(
+        db, user_id, cursor=cursor, limit=limit, order=order, format=format, course_type=course_type, tag=tag,
+        requires_certificate=requires_certificate, min_rating=min_rating, sort=sort,
+    )
+    response.headers.update(validator_headers(etag))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
     return courses
 
 
+@router.get("/recommended/{user_id}", response_model=list[CourseRecommendationOut])
+async def recommended(user_id: int, limit: int = Query(10, ge=1, le=50), db: DbSession = Depends(get_db)):
+    return await recommendation_service.recommend_courses(user_id, db, limit=limit)
+
+
 @router.get("/detail/{course_id}/{user_id}", response_model=CourseDetailResponse)
-async def get_detail(course_id: int, user_id: int, db: Session = Depends(get_db)):
-    return course_service.get_course_detail(course_id, user_id, db)
+async def get_detail(course_id: int, user_id: int, request: Request, response: Response,
+                     db: DbSession = Depends(get_db)):
+    state = await course_service.get_course_state(course_id, user_id, db)
+    if cached := not_modified(request, state.etag):
+        return cached
+    response.headers.update(validator_headers(state.etag))
+    return await course_service.get_course_detail(course_id, user_id, db, state=state)
 
 
 @router.get("/{course_id}/download", response_model=CourseDownloadOut)
-async def download_by_id(course_id: int, db: Session = Depends(get_db)):
-    return course_service.get_course_download(course_id, db)
+async def download_by_id(course_id: int, request: Request, db: DbSession = Depends(get_db)):
+    file_url = str(request.url_for("download_course_file", course_id=course_id))
+    return await run_db(db, lambda s: course_service.get_course_download(course_id, s, file_url=file_url))
+
+
+@router.get("/{course_id}/file", name="download_course_file")
+async def download_file(course_id: int, request: Request, db: DbSession = Depends(get_db)):
+    file_path, sha256 = await run_db(db, lambda s: course_service.get_course_file(course_id, s))
+    headers = {"etag": f'"{sha256}"'} if sha256 else {}
+    if sha256 and etag_matches(request.headers.get("if-none-match"), headers["etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # FileResponse answers Range/If-Range itself and uses the server's pathsend (sendfile) when offered
+    return FileResponse(file_path, headers=headers)
 
 
 @router.get("/{course_id}/progress/{user_id}", response_model=CourseProgressOut)
-async def progress_by_id(course_id: int, user_id: int, db: Session = Depends(get_db)) -> CourseProgressOut:
-    return course_service.get_progress(course_id, db, user_id=user_id)
+async def progress_by_id(course_id: int, user_id: int, db: DbSession = Depends(get_db)) -> CourseProgressOut:
+    return await course_service.get_progress(course_id, db, user_id=user_id)
 
 
 @router.patch("/{course_id}/progress/{user_id}", response_model=CourseProgressOut)
 async def progress_update(course_id: int, user_id: int, payload: CourseProgressIn,
-                          db: Session = Depends(get_db)) -> CourseProgressOut:
-    return course_service.upsert_progress(course_id, payload, db, user_id=user_id)
+                          db: DbSession = Depends(get_db)) -> CourseProgressOut:
+    return await course_service.upsert_progress(course_id, payload, db, user_id=user_id)
+
+
+@router.post("/progress/{user_id}/sync", response_model=CourseProgressSyncOut)
+async def progress_sync(user_id: int, payload: CourseProgressSyncIn, db: DbSession = Depends(get_db)):
+    return await course_service.sync_progress(user_id, payload, db)
 
 
 @router.patch("/{course_id}/download/{user_id}", response_model=CourseProgressOut)
@@ -42,21 +132,65 @@ async def update_download_status(
     course_id: int,
     user_id: int,
     payload: CourseDownloadStatusIn,
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ) -> CourseProgressOut:
-    return course_service.update_download_status(course_id, user_id, payload, db)
+    return await course_service.update_download_status(course_id, user_id, payload, db)
+
+
+@router.put("/{course_id}/rating/{user_id}", response_model=CourseRatingOut)
+async def rate(course_id: int, user_id: int, payload: CourseRatingIn, db: DbSession = Depends(get_db)):
+    return await rating_service.rate_course(course_id, user_id, payload, db)
 
 
 @router.post("/", response_model=CourseOut, status_code=status.HTTP_201_CREATED)
-async def create_course(payload: CourseCreate, db: Session = Depends(get_db)):
-    course = course_service.create_course(payload, db)
+async def create_course(payload: CourseCreate, db: DbSession = Depends(get_db)):
+    course = await course_service.create_course(payload, db)
     return course
 
 
-@router.post("/{course_id}/upload", response_model=CourseOut, status_code=status.HTTP_201_CREATED)
-async def upload_course_file(
+@router.post("/import", response_model=CourseImportOut)
+async def import_courses(request: Request, db: DbSession = Depends(get_db)):
+    """NDJSON body, one CourseCreate object per line; rows that fail are listed by line number, the rest are kept."""
+    return await catalog_service.import_courses(catalog_service.ndjson_lines(request.stream()), db)
+
+
+@router.post("/{course_id}/upload", response_model=CourseOut, status_code=status.HTTP_201_CREATED, openapi_extra={
+    "requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+    }}}},
+})
+async def upload_course_file(course_id: int, request: Request, db: DbSession = Depends(get_db)):
+    """multipart/form-data with a ``file`` field; read from the request stream, not spooled by the framework."""
+    return await course_service.upload_course_file(course_id, request.headers, request.stream(), db)
+
+
+@router.post("/{course_id}/upload/sessions", response_model=UploadSessionOut, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(course_id: int, payload: UploadSessionCreate, db: DbSession = Depends(get_db)):
+    return await run_db(db, lambda s: upload_service.create_session(course_id, payload, s))
+
+
+@router.get("/{course_id}/upload/sessions/{upload_id}", response_model=UploadSessionOut)
+async def get_upload_session(course_id: int, upload_id: str, db: DbSession = Depends(get_db)):
+    return await run_db(db, lambda s: upload_service.get_session(course_id, upload_id, s))
+
+
+@router.put("/{course_id}/upload/sessions/{upload_id}/parts/{part_number}", response_model=UploadPartOut)
+async def upload_part(
         course_id: int,
-        file: UploadFile = File(...),
-        db: Session = Depends(get_db),
+        upload_id: str,
+        request: Request,
+        part_number: int = Path(..., ge=1, le=10000),
+        db: DbSession = Depends(get_db),
 ):
-    return await course_service.upload_course_file(course_id, file, db)
+    return await upload_service.upload_part(course_id, upload_id, part_number, request.stream(), db)
+
+
+@router.post("/{course_id}/upload/sessions/{upload_id}/complete", response_model=CourseOut)
+async def complete_upload_session(course_id: int, upload_id: str, db: DbSession = Depends(get_db)):
+    return await upload_service.complete_session(course_id, upload_id, db)
+
+
+@router.delete("/{course_id}/upload/sessions/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(course_id: int, upload_id: str, db: DbSession = Depends(get_db)):
+    await upload_service.abort_session(course_id, upload_id, db)
+    return
@@ -1,27 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from starlette import status
 
-from app.config.settings import get_db
+from app.config.settings import get_db, DbSession
 from app.schema import schema as schemas
-from app.service.user_service import create_user, get_user, edit_user
+from app.service import dashboard_service
+from app.service.user_service import create_user, get_user, edit_user, get_profile_version, profile_etag
+from app.util.conditional import not_modified, validator_headers
 
 router = APIRouter(tags=["auth"])
 
 
 @router.post("/create", response_model=schemas.UserProfileResponse, status_code=status.HTTP_201_CREATED)
-def create(payload: schemas.UserCreate, db: Session = Depends(get_db)):
-    return create_user(payload, db)
+async def create(payload: schemas.UserCreate, db: DbSession = Depends(get_db)):
+    return await create_user(payload, db)
 
 
 @router.patch("/edit/{user_id}", response_model=schemas.UserProfileResponse)
-def edit(user_id: int, payload: schemas.UserUpdate, db: Session = Depends(get_db)):
-    return edit_user(user_id, payload, db)
+async def edit(user_id: int, payload: schemas.UserUpdate, db: DbSession = Depends(get_db)):
+    return await edit_user(user_id, payload, db)
 
 
 @router.get("/get/{user_id}", response_model=schemas.UserProfileResponse)
-def get(user_id: int, db: Session = Depends(get_db)):
-    user = get_user(user_id, db)
+async def get(user_id: int, request: Request, response: Response, db: DbSession = Depends(get_db)):
+    version = await get_profile_version(user_id, db)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    etag = profile_etag(user_id, version)
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers.update(validator_headers(etag))
+    user = await get_user(user_id, db, version=version)
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     return user
+
+
+@router.get("/dashboard/{user_id}", response_model=schemas.UserDashboardOut)
+async def dashboard(user_id: int, db: DbSession = Depends(get_db)):
+    return await dashboard_service.get_dashboard(user_id, db)
@@ -1,33 +1,46 @@
-from fastapi import APIRouter, Depends, status, Query
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from app.config.settings import get_db
+from fastapi import APIRouter, Depends, status, Query, Response
+
+from app.config.settings import get_db, run_db, DbSession
 from app.schema import schema as schemas
 from app.service import watchlist_service
 
 router = APIRouter()
 
 
-@router.get("/get", response_model=list[schemas.WatchlistOut])
+@router.get("/get", response_model=list[schemas.WatchlistEntryOut] | list[schemas.WatchlistOut])
 async def get_watchlist(
-        user_id: str = Query(..., description="ID del usuario"),
-        db: Session = Depends(get_db),
+        response: Response,
+        user_id: int = Query(..., description="ID del usuario"),
+        expand: bool = Query(False, description="Incluir el resumen del curso y el progreso del usuario"),
+        cursor: Optional[str] = Query(None, description="ID de la última entrada de la página anterior"),
+        limit: Optional[int] = Query(None, ge=1, le=100),
+        db: DbSession = Depends(get_db),
 ):
-    items = watchlist_service.get_watchlist(db, user_id)
-    return [schemas.WatchlistOut.model_validate(i) for i in items]
+    list_fn = watchlist_service.get_watchlist_entries if expand else watchlist_service.get_watchlist
+    items, next_cursor = await run_db(db, lambda s: list_fn(s, user_id, cursor=cursor, limit=limit))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 @router.post("/", response_model=schemas.WatchlistOut, status_code=status.HTTP_201_CREATED)
-async def add_watchlist(payload: schemas.WatchlistCreate, db: Session = Depends(get_db)):
-    item = watchlist_service.add_to_watchlist(payload, db)
+async def add_watchlist(payload: schemas.WatchlistCreate, db: DbSession = Depends(get_db)):
+    item = await run_db(db, lambda s: watchlist_service.add_to_watchlist(payload, s))
     return schemas.WatchlistOut.model_validate(item)
 
 
+@router.post("/bulk", response_model=schemas.WatchlistBulkOut)
+async def bulk_watchlist(payload: schemas.WatchlistBulkIn, db: DbSession = Depends(get_db)):
+    return await run_db(db, lambda s: watchlist_service.bulk_update_watchlist(payload, s))
+
+
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_watchlist(
-        user_id: str = Query(...),
-        course_id: str = Query(...),
-        db: Session = Depends(get_db),
+        user_id: int = Query(...),
+        course_id: int = Query(...),
+        db: DbSession = Depends(get_db),
 ):
-    watchlist_service.remove_from_watchlist(user_id, course_id, db)
+    await run_db(db, lambda s: watchlist_service.remove_from_watchlist(user_id, course_id, s))
     return
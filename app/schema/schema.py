@@ -43,6 +43,15 @@ class UserProfileResponse(BaseModel):
         from_attributes = True  # Pydantic v2
 
 
+class UserDashboardOut(BaseModel):
+    user_id: int
+    in_progress: int  # started, under 100%
+    completed: int
+    downloaded: int
+    learning_seconds: int  # duration watched so far, summed over courses
+    updated_at: Optional[datetime] = None
+
+
 # -------------------------------------------- COURSE --------------------------------------------
 FormatLiteral = Literal["video", "xapi", "pdf"]
 CourseTypeLiteral = Literal["self_paced", "instructor_led"]
@@ -91,12 +100,41 @@ class CourseDownloadStatusIn(BaseModel):
     is_downloaded: bool
 
 
+class CourseRatingIn(BaseModel):
+    rating: int = Field(..., ge=1, le=5)
+
+
+class CourseRatingOut(BaseModel):
+    course_id: int
+    user_id: int
+    rating: int
+    rating_avg: float  # the course's average after this submission
+    rating_count: int
+
+
 class CourseProgressOut(BaseModel):
     course_id: int
     progress: float
     is_downloaded: bool = False
 
 
+class CourseProgressSyncItem(BaseModel):
+    course_id: int
+    progress: Optional[float] = Field(None, ge=0, le=100)
+    is_downloaded: Optional[bool] = None
+    client_timestamp: datetime
+
+
+class CourseProgressSyncIn(BaseModel):
+    items: List[CourseProgressSyncItem] = Field(..., min_length=1, max_length=1000)
+
+
+class CourseProgressSyncOut(BaseModel):
+    applied: int  # entries that won last-writer-wins
+    unknown_course_ids: List[int] = []
+    progress: List[CourseProgressOut] = []
+
+
 # “Slim” out
 class CourseOut(BaseModel):
     id: int
@@ -105,6 +143,8 @@ class CourseOut(BaseModel):
     title_image: Optional[str] = None
     thumbnail_url: Optional[str] = None
     download_url: Optional[str] = None
+    file_sha256: Optional[str] = None
+    file_size: Optional[int] = None
     created_at: datetime
     model_config = ConfigDict(from_attributes=True)
 
@@ -119,6 +159,7 @@ class CourseDetailResponse(BaseModel):
     course_type: CourseTypeLiteral
     learning_goals: Optional[list[str]] = []
     rating: float  # 1..5 average
+    rating_count: int = 0
     is_downloaded: bool
     progress: float  # 0..100
     title_image: Optional[str] = None
@@ -126,9 +167,45 @@ class CourseDetailResponse(BaseModel):
     download_url: Optional[str] = None
     tags: Optional[List[str]] = None
     requires_certificate: bool
+    updated_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
 
+class CourseSearchHit(BaseModel):
+    id: int
+    title: str
+    title_highlight: str  # matches wrapped in <mark>...</mark>
+    snippet: Optional[str] = None
+    score: float  # higher is more relevant
+
+
+class CourseRecommendationOut(CourseDetailResponse):
+    score: float  # 0 when filled in from popular courses
+
+
+class TagFacet(BaseModel):
+    tag: str
+    count: int
+
+
+class TagFacetsOut(BaseModel):
+    total: int  # courses matching the filters
+    tags: list[TagFacet]
+
+
+class CourseImportError(BaseModel):
+    line: int  # 1-based line of the NDJSON body
+    id: Optional[int] = None
+    detail: str
+
+
+class CourseImportOut(BaseModel):
+    imported: int
+    failed: int
+    errors: list[CourseImportError]
+    errors_truncated: bool = False  # more rows failed than are listed
+
+
 class CourseDownloadOut(BaseModel):
     course_id: int  # use str if you kept UUID PKs
     download_url: str
@@ -136,14 +213,75 @@ class CourseDownloadOut(BaseModel):
 
 # -------------------------------------------- WATCHLIST --------------------------------------------
 class WatchlistCreate(BaseModel):
-    course_id: str
-    user_id: str
+    course_id: int
+    user_id: int
 
 
 class WatchlistOut(BaseModel):
     id: str
-    course_id: str
-    user_id: str
+    course_id: int
+    user_id: int
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class WatchlistCourseOut(BaseModel):
+    id: int
+    title: str
+    duration: Optional[str] = None
+    format: FormatLiteral
+    course_type: CourseTypeLiteral
+    rating: float
+    thumbnail_url: Optional[str] = None
+    requires_certificate: bool
+
+
+# Watchlist entry with the course summary and the caller's progress (?expand=true)
+class WatchlistEntryOut(WatchlistOut):
+    course: WatchlistCourseOut
+    progress: float
+    is_downloaded: bool
+
+
+class WatchlistBulkIn(BaseModel):
+    user_id: int
+    add: list[int] = Field(default_factory=list, max_length=500)
+    remove: list[int] = Field(default_factory=list, max_length=500)
+
+
+class WatchlistBulkOut(BaseModel):
+    added: list[int]
+    already_present: list[int]
+    removed: list[int]
+    not_found: list[int]
+    unknown_course_ids: list[int]
+
+
+# -------------------------------------------- UPLOAD SESSION --------------------------------------------
+class UploadSessionCreate(BaseModel):
+    file_name: str
+    total_size: Optional[int] = Field(None, ge=1)
+    part_size: Optional[int] = Field(None, ge=256 * 1024, le=256 * 1024 * 1024)
+
+
+class UploadPartOut(BaseModel):
+    part_number: int
+    offset: int
+    size: int
+    sha256: str
+
+
+class UploadSessionOut(BaseModel):
+    id: str
+    course_id: int
+    file_name: str
+    part_size: int
+    total_size: Optional[int] = None
+    status: str
+    received_bytes: int
+    parts: List[UploadPartOut] = []
+
+
+class ChatMessageIn(BaseModel):
+    message: str = Field(..., min_length=1, max_length=4000)
@@ -1,16 +1,37 @@
 from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
 
+from app.config.settings import DbSession, release_db, run_db
 from app.model import model as models
-from app.util.security import verify_password
+from app.util.security import verify_and_update_password, create_access_token, JWT_EXPIRES_SECONDS
 
 
-def login_service(email: str, password: str, db):
-    user = db.query(models.User).filter(models.User.email == email).first()
+def _get_user_by_email(email: str, db: Session) -> models.User | None:
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def _update_password_hash(user_id: int, password_hash: str, db: Session) -> None:
+    user = db.get(models.User, user_id)
+    if user:
+        user.password = password_hash
+        db.commit()
+
+
+async def login_service(email: str, password: str, db: DbSession):
+    user = await run_db(db, lambda s: _get_user_by_email(email, s))
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
-    if not verify_password(password, user.password):
+    user_id, stored_hash = user.id, user.password
+    # Nothing is held while argon2 runs, so a login burst cannot take the pool away from other requests
+    await release_db(db)
+    valid, new_hash = await verify_and_update_password(password, stored_hash)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
-    token = 'igxApoxPwT66sYBzenkEUf6YMtzk8Zh7'
-    return {"access_token": token, "user_id": user.id, }
+    # Argon2 parameters changed since this hash was stored: upgrade it transparently
+    if new_hash:
+        await run_db(db, lambda s: _update_password_hash(user_id, new_hash, s))
+
+    token = create_access_token(user_id)
+    return {"access_token": token, "token_type": "bearer", "expires_in": JWT_EXPIRES_SECONDS, "user_id": user_id, }
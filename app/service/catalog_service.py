@@ -0,0 +1,245 @@
+import json
+import os
+from typing import AsyncIterable, AsyncIterator, NamedTuple, Optional
+
+from fastapi import FastAPI
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config.settings import DbSession, open_db, run_db
+from app.model import model as models
+from app.schema import schema as schemas
+from app.service import course_service, retrieval_service, search_service
+
+IMPORT_BATCH_SIZE = int(os.getenv("COURSE_IMPORT_BATCH_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("COURSE_EXPORT_BATCH_SIZE", "1000"))
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+# Same fields as CourseCreate, so an export can be imported again as is
+_EXPORT_COLUMNS = (
+    models.Course.id,
+    models.Course.title,
+    models.Course.description,
+    models.Course.duration_seconds,
+    models.Course.format,
+    models.Course.course_type,
+    models.Course.learning_goals,
+    models.Course.rating_avg,
+    models.Course.requires_certificate,
+    models.Course.title_image,
+    models.Course.thumbnail_url,
+    models.Course.download_url,
+    models.Course.is_downloaded,
+)
+_EXPORT_KEYS = tuple(column.key for column in _EXPORT_COLUMNS)
+
+
+class _Row(NamedTuple):
+    line: int
+    payload: schemas.CourseCreate
+
+
+# --------- import ---------
+
+async def ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, Optional[bytes]]]:
+    """Split a byte stream into (line number, line) pairs; lines over MAX_LINE_BYTES come out as ``None``."""
+    buffer = bytearray()
+    line_no = 0
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) >= 0:
+            line_no += 1
+            if not oversized:
+                buffer += chunk[start:end]
+            yield line_no, None if oversized or len(buffer) > MAX_LINE_BYTES else bytes(buffer)
+            oversized = False
+            buffer.clear()
+            start = end + 1
+        if not oversized:
+            buffer += chunk[start:]
+            if len(buffer) > MAX_LINE_BYTES:
+                # Drop the rest of the line instead of holding it in memory
+                oversized = True
+                buffer.clear()
+    if buffer or oversized:
+        yield line_no + 1, None if oversized else bytes(buffer)
+
+
+def _validation_detail(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'linea'}: {e['msg']}" for e in exc.errors())
+
+
+def _insert_rows(rows: list[_Row], db: Session) -> list[tuple[int, schemas.CourseCreate]]:
+    created = []
+    # Rows with and without an explicit id go in separate statements: every row of an executemany needs the same keys
+    for explicit in (True, False):
+        group = [r.payload for r in rows if (r.payload.id is not None) == explicit]
+        if not group:
+            continue
+        values = [course_service.course_values(p) for p in group]
+        if not explicit:
+            for v in values:
+                del v["id"]
+        # Core table inserts: the ORM bulk path costs more per row than the database does
+        courses = models.Course.__table__
+        if explicit:
+            db.execute(insert(courses), values)
+            ids = [v["id"] for v in values]
+        elif db.get_bind().dialect.insert_returning:
+            ids = db.execute(insert(courses).returning(courses.c.id, sort_by_parameter_order=True), values).scalars().all()
+        else:
+            # No INSERT ... RETURNING (MySQL): one statement per row, each reporting its generated id
+            ids = [db.execute(insert(courses).values(v)).inserted_primary_key[0] for v in values]
+        created += zip(ids, group)
+
+    tags = {course_id: course_service.clean_tags(p.tags) for course_id, p in created}
+    tag_rows = [{"course_id": course_id, "tag": t} for course_id, ts in tags.items() for t in ts]
+    if tag_rows:
+        db.execute(insert(models.CourseTag.__table__), tag_rows)
+    search_service.index_documents([
+        search_service.document(course_id, p.title, tags[course_id], p.learning_goals, p.description)
+        for course_id, p in created
+    ], db)
+    return created
+
+
+def _import_batch(rows: list[_Row], db: Session) -> tuple[list[tuple[int, schemas.CourseCreate]],
+                                                          list[schemas.CourseImportError]]:
+    """Insert one chunk in one transaction; rows that cannot go in are reported instead of failing the chunk."""
+    errors = []
+    explicit = [r.payload.id for r in rows if r.payload.id is not None]
+    taken = set(db.scalars(select(models.Course.id).where(models.Course.id.in_(explicit)))) if explicit else set()
+    accepted = []
+    for r in rows:
+        if r.payload.id is not None:
+            if r.payload.id in taken:
+                errors.append(schemas.CourseImportError(line=r.line, id=r.payload.id, detail="ID de curso ya existe"))
+                continue
+            taken.add(r.payload.id)
+        accepted.append(r)
+
+    try:
+        created = _insert_rows(accepted, db)
+        db.commit()
+    except IntegrityError:
+        # Something raced the id check (or broke a constraint): redo the chunk row by row to find the culprits
+        db.rollback()
+        created = []
+        for r in accepted:
+            try:
+                created += _insert_rows([r], db)
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                errors.append(schemas.CourseImportError(line=r.line, id=r.payload.id,
+                                                        detail="El curso viola una restricción de la base de datos"))
+    return created, errors
+
+
+async def import_courses(lines: AsyncIterable[tuple[int, Optional[bytes]]], db: DbSession) -> schemas.CourseImportOut:
+    """Import CourseCreate objects, one per line, in chunks of IMPORT_BATCH_SIZE; each chunk commits on its own.
+
+    Memory is bounded by one chunk whatever the size of the input. Blank lines are skipped.
+    """
+    result = schemas.CourseImportOut(imported=0, failed=0, errors=[])
+
+    def report(error: schemas.CourseImportError):
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(error)
+        else:
+            result.errors_truncated = True
+
+    async def flush(rows: list[_Row]):
+        created, errors = await run_db(db, lambda s: _import_batch(rows, s))
+        for error in errors:
+            report(error)
+        result.imported += len(created)
+        await retrieval_service.index_courses([
+            (course_id, retrieval_service.course_text(p.title, p.description, p.learning_goals, p.tags))
+            for course_id, p in created
+        ])
+
+    batch: list[_Row] = []
+    try:
+        async for line_no, raw in lines:
+            if raw is None:
+                report(schemas.CourseImportError(line=line_no, detail=f"Línea de más de {MAX_LINE_BYTES} bytes"))
+                continue
+            if not raw.strip():
+                continue
+            try:
+                batch.append(_Row(line_no, schemas.CourseCreate.model_validate_json(raw)))
+            except ValidationError as exc:
+                report(schemas.CourseImportError(line=line_no, detail=_validation_detail(exc)))
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                rows, batch = batch, []
+                await flush(rows)
+        if batch:
+            await flush(batch)
+    finally:
+        # One generation bump for the whole import (committed chunks included if it stops half way),
+        # which also reaches servers sharing the cache backend when the import runs from the CLI
+        if result.imported:
+            await course_service.invalidate_catalog()
+    return result
+
+
+# --------- export ---------
+
+def _export_query():
+    # One pass over courses joined with their tags (last column); rows of the same course arrive together
+    return (
+        select(*_EXPORT_COLUMNS, models.CourseTag.tag)
+        .outerjoin(models.CourseTag, models.CourseTag.course_id == models.Course.id)
+        .order_by(models.Course.id, models.CourseTag.id)
+    )
+
+
+async def _partitions(db: DbSession, stmt) -> AsyncIterator[list]:
+    """Rows of ``stmt`` in lists of EXPORT_BATCH_SIZE, read through a server-side cursor."""
+    if isinstance(db, AsyncSession):
+        result = await db.stream(stmt)
+        async for rows in result.partitions(EXPORT_BATCH_SIZE):
+            yield rows
+        return
+    # Through run_db like any other call, so the stream holds a run_db permit for its connection
+    result = await run_db(db, lambda s: s.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)))
+    try:
+        while rows := await run_db(db, lambda s: result.fetchmany(EXPORT_BATCH_SIZE)):
+            yield rows
+    finally:
+        result.close()
+
+
+def _export_line(row, tags: list[str]) -> str:
+    # Positional: named access on a Row costs more than the rest of the line
+    course = dict(zip(_EXPORT_KEYS, row))
+    course["tags"] = tags
+    return json.dumps(course, ensure_ascii=False) + "\n"
+
+
+async def export_courses(app: FastAPI) -> AsyncIterator[bytes]:
+    """The whole catalog as NDJSON, streamed: one course per line in id order, in chunks of EXPORT_BATCH_SIZE rows."""
+    # Owns its session: the response body is produced after the request's dependencies are gone
+    async with open_db(app) as db:
+        current, tags = None, []
+        async for rows in _partitions(db, _export_query()):
+            out = []
+            for row in rows:
+                if current is not None and row[0] != current[0]:
+                    out.append(_export_line(current, tags))
+                    tags = []
+                current = row
+                if row[-1] is not None:
+                    tags.append(row[-1])
+            if out:
+                yield "".join(out).encode("utf-8")
+        if current is not None:
+            yield _export_line(current, tags).encode("utf-8")
@@ -1,5 +1,118 @@
-def send_message_service(message):
-    response = "Hi I am ChatGPT, I just received your message, "
-    response += message
-    response += ", my response is: response."
-    return response
\ No newline at end of file
+import asyncio
+import importlib
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable, Protocol, Sequence
+
+from fastapi import HTTPException, status
+
+from app.config.settings import DbSession
+from app.schema import schema as schemas
+from app.service import course_service, retrieval_service
+
+MAX_STREAMS_PER_USER = int(os.getenv("CHAT_MAX_STREAMS_PER_USER", "2"))
+CONTEXT_COURSES = int(os.getenv("CHAT_CONTEXT_COURSES", "3"))
+
+
+class ChatBackend(Protocol):
+    def stream(self, message: str, context: Sequence[schemas.CourseDetailResponse] = ()) -> AsyncIterator[str]:
+        """Yield the answer to ``message`` piece by piece, grounded in the ``context`` courses."""
+        ...
+
+
+class FakeChatBackend:
+    """Deterministic local backend: the same answer for the same message, one word at a time."""
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+
+    async def stream(self, message: str, context: Sequence[schemas.CourseDetailResponse] = ()) -> AsyncIterator[str]:
+        response = "Hi I am ChatGPT, I just received your message, "
+        response += message
+        response += ", my response is: response."
+        if context:
+            response += " Related courses: " + "; ".join(c.title for c in context) + "."
+        words = response.split(" ")
+        for i, word in enumerate(words):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+
+def create_chat_backend(spec: str | None) -> ChatBackend:
+    # CHAT_BACKEND=package.module:factory plugs in a real model client; anything else uses the fake
+    if spec and ":" in spec:
+        module, _, name = spec.partition(":")
+        return getattr(importlib.import_module(module), name)()
+    return FakeChatBackend(token_delay=float(os.getenv("CHAT_FAKE_TOKEN_DELAY_MS", "0")) / 1000)
+
+
+chat_backend: ChatBackend = create_chat_backend(os.getenv("CHAT_BACKEND"))
+
+_active_streams: dict[Hashable, int] = {}
+
+
+class ChatSlot:
+    """One of a user's concurrent answers; ``release`` is idempotent so every exit path may call it."""
+
+    def __init__(self, user_key: Hashable):
+        self.user_key = user_key
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        _active_streams[self.user_key] -= 1
+        if not _active_streams[self.user_key]:
+            del _active_streams[self.user_key]
+
+
+def acquire_chat_slot(user_key: Hashable) -> ChatSlot:
+    if _active_streams.get(user_key, 0) >= MAX_STREAMS_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiadas respuestas en curso, intenta de nuevo",
+            headers={"Retry-After": "1"},
+        )
+    _active_streams[user_key] = _active_streams.get(user_key, 0) + 1
+    return ChatSlot(user_key)
+
+
+@asynccontextmanager
+async def chat_slot(user_key: Hashable):
+    slot = acquire_chat_slot(user_key)
+    try:
+        yield slot
+    finally:
+        slot.release()
+
+
+async def course_context(message: str, db: DbSession) -> list[schemas.CourseDetailResponse]:
+    """Catalog courses most relevant to ``message``, best first, for the backend to ground its answer in."""
+    hits = await retrieval_service.retrieve_courses(message, CONTEXT_COURSES)
+    summaries = await course_service.get_course_summaries([course_id for course_id, _ in hits], db)
+    return [summaries[course_id] for course_id, _ in hits if course_id in summaries]
+
+
+async def stream_message(message: str,
+                         context: Sequence[schemas.CourseDetailResponse] = ()) -> AsyncIterator[str]:
+    stream = chat_backend.stream(message, context)
+    try:
+        async for token in stream:
+            yield token
+    finally:
+        # Runs on client disconnect too (the consumer is cancelled), so the backend call is dropped
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def send_message_service(message: str, user_key: Hashable, db: DbSession) -> str:
+    async with chat_slot(user_key):
+        context = await course_context(message, db)
+        return "".join([token async for token in stream_message(message, context)])
+
+
+def stats() -> dict:
+    return {"active_streams": sum(_active_streams.values()), "active_users": len(_active_streams)}
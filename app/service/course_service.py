@@ -1,16 +1,44 @@
+import hashlib
 import os
+import tempfile
+from contextlib import suppress
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Iterable
+from typing import Any, AsyncIterator, Mapping, Optional, Iterable, BinaryIO, Iterator, NamedTuple
+from uuid import uuid4
 
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select, func, tuple_
+from sqlalchemy.orm import Session, selectinload
 
+from app.config.settings import DbSession, run_db, open_db, env_flag, cache_backend
 from app.model import model as models
 from app.model.model import Course
 from app.schema import schema as schemas
-
-
-def _format_duration(seconds: Optional[int]) -> Optional[str]:
+from app.service import dashboard_service, retrieval_service, search_service
+from app.util.cache import Cache
+from app.util.conditional import weak_etag
+from app.util.multipart import MultipartError, MultipartFile
+from app.util.sql import upsert
+from app.util.write_behind import WriteBehindBuffer
+
+# User-independent course DTOs (progress=0, is_downloaded=False); the caller's progress is overlaid per request
+course_cache = Cache(
+    cache_backend,
+    "course",
+    schemas.CourseDetailResponse,
+    ttl=float(os.getenv("COURSE_CACHE_TTL_SECONDS", "300")),
+)
+
+# Optional write-behind for progress/download updates, coalesced per (user_id, course_id)
+progress_buffer = WriteBehindBuffer(
+    interval=float(os.getenv("PROGRESS_FLUSH_SECONDS", "2")),
+    max_pending=int(os.getenv("PROGRESS_FLUSH_MAX_PENDING", "500")),
+) if env_flag("PROGRESS_WRITE_BEHIND") else None
+
+
+def format_duration(seconds: Optional[int]) -> Optional[str]:
     if seconds is None:
         return None
     h, rem = divmod(seconds, 3600)
@@ -24,26 +52,26 @@ def _format_duration(seconds: Optional[int]) -> Optional[str]:
     return f"{seconds}s"
 
 
-def _to_detail(course: models.Course, user_id: int) -> schemas.CourseDetailResponse:
+def _to_detail(course: models.Course,
+               user_progress: Optional[models.CourseProgress]) -> schemas.CourseDetailResponse:
     tags = [t.tag for t in (course.tags or [])] or None
 
     progress_val = 0
     is_downloaded_val = False
-    if course.progress_items:
-        user_progress = next((p for p in course.progress_items if p.user_id == user_id), None)
-        if user_progress:
-            progress_val = user_progress.progress
-            is_downloaded_val = bool(user_progress.is_downloaded)
+    if user_progress:
+        progress_val = user_progress.progress
+        is_downloaded_val = bool(user_progress.is_downloaded)
 
     return schemas.CourseDetailResponse(
         id=course.id,
         title=course.title,
         description=course.description,
-        duration=_format_duration(course.duration_seconds),
+        duration=format_duration(course.duration_seconds),
         format=course.format,
         course_type=course.course_type,
         learning_goals=course.learning_goals,
         rating=round(course.rating_avg or 0.0, 2),
+        rating_count=course.rating_count or 0,
         is_downloaded=is_downloaded_val,
         progress=progress_val,
         title_image=course.title_image,
@@ -51,59 +79,219 @@ def _to_detail(course: models.Course, user_id: int) -> schemas.CourseDetailRespo
         download_url=course.download_url,
         tags=tags,
         requires_certificate=bool(course.requires_certificate),
+        updated_at=course.updated_at,
+    )
+
+
+def _with_progress(base: schemas.CourseDetailResponse, progress: Optional[float],
+                   is_downloaded: Optional[bool]) -> schemas.CourseDetailResponse:
+    return base.model_copy(update={"progress": progress or 0, "is_downloaded": bool(is_downloaded)})
+
+
+def _load_course_details(course_ids: list[int], db: Session) -> dict[int, schemas.CourseDetailResponse]:
+    # Tags come in one extra SELECT ... IN for the whole batch
+    courses = (
+        db.query(models.Course)
+        .options(selectinload(models.Course.tags))
+        .filter(models.Course.id.in_(course_ids))
+        .all()
+    )
+    return {course.id: _to_detail(course, None) for course in courses}
+
+
+async def _course_bases(db: DbSession, versions: dict[int, Any]) -> dict[int, schemas.CourseDetailResponse]:
+    """Cached course DTOs by id; only misses and entries older than ``versions`` (id -> updated_at) hit the ORM.
+
+    Checking updated_at keeps a cache that missed an invalidation (another worker, memory backend)
+    from serving a body older than the ETag computed from the same row.
+    """
+    def load(ids):
+        return run_db(db, lambda s: _load_course_details(ids, s))
+
+    bases = await course_cache.get_or_load(list(versions), load)
+    stale = [course_id for course_id, base in bases.items() if base.updated_at != versions[course_id]]
+    if stale:
+        fresh = await load(stale)
+        await course_cache.set_many(fresh)
+        bases.update(fresh)
+    return bases
+
+
+def _course_versions(course_ids: list[int], db: Session) -> dict[int, Any]:
+    rows = db.execute(select(models.Course.id, models.Course.updated_at).where(models.Course.id.in_(course_ids)))
+    return {row.id: row.updated_at for row in rows}
+
+
+async def get_course_summaries(course_ids: list[int], db: DbSession) -> dict[int, schemas.CourseDetailResponse]:
+    """User-independent course DTOs (progress 0) by id, through the course cache; unknown ids are left out."""
+    if not course_ids:
+        return {}
+    versions = await run_db(db, lambda s: _course_versions(course_ids, s))
+    return await _course_bases(db, versions)
+
+
+async def invalidate_course(*course_ids: int):
+    """Drop cached DTOs; call after committing any change to a course or its tags."""
+    await course_cache.invalidate(*course_ids)
+
+
+async def invalidate_catalog():
+    """Drop every cached course DTO at once; call after committing a write that touches much of the catalog."""
+    await course_cache.invalidate_all()
+
+
+def _catalog_rows(db: Session, user_id: int):
+    # Only ids and the caller's progress columns: no ORM entities, and other users' progress is never read
+    return (
+        db.query(
+            models.Course.id,
+            models.Course.updated_at,
+            models.CourseProgress.progress,
+            models.CourseProgress.is_downloaded,
+        )
+        .outerjoin(
+            models.CourseProgress,
+            and_(
+                models.CourseProgress.course_id == models.Course.id,
+                models.CourseProgress.user_id == user_id,
+            ),
+        )
     )
 
 
+def clean_tags(tags: Optional[Iterable[str]]) -> list[str]:
+    """Stripped, non-empty, de-duplicated tags in their original order."""
+    return list(dict.fromkeys(t.strip() for t in tags or [] if t and t.strip()))
+
+
 def _set_tags(course: models.Course, tags: Optional[Iterable[str]]):
     if tags is None:
         return
-    clean = [t.strip() for t in tags if t and t.strip()]
-    course.tags = [models.CourseTag(tag=t) for t in dict.fromkeys(clean)]
+    course.tags = [models.CourseTag(tag=t) for t in clean_tags(tags)]
 
 
-# --------- services ---------
-
-def create_course(payload: schemas.CourseCreate, db: Session) -> models.Course:
+def course_values(payload: schemas.CourseCreate) -> dict:
+    """Column values for a new ``courses`` row (tags excluded)."""
     data = payload.model_dump()
+    return {
+        "id": data.get("id"),
+        "title": data["title"],
+        "description": data.get("description"),
+        "duration_seconds": data.get("duration_seconds"),
+        "format": data.get("format") or "video",
+        "course_type": data.get("course_type") or "self_paced",
+        "learning_goals": data.get("learning_goals"),
+        "rating_avg": data.get("rating_avg") or 0.0,
+        "requires_certificate": bool(data.get("requires_certificate") or False),
+        "title_image": str(data["title_image"]) if data.get("title_image") else None,
+        "thumbnail_url": str(data["thumbnail_url"]) if data.get("thumbnail_url") else None,
+        "download_url": str(data["download_url"]) if data.get("download_url") else None,
+        "is_downloaded": bool(data.get("is_downloaded") or False),
+    }
+
 
-    if data.get("id") is not None:
-        existing = db.get(models.Course, data["id"])
+# --------- services ---------
+
+def _insert_course(payload: schemas.CourseCreate, db: Session) -> models.Course:
+    if payload.id is not None:
+        existing = db.get(models.Course, payload.id)
         if existing:
             raise HTTPException(status_code=400, detail="ID de curso ya existe")
 
-    course = models.Course(
-        id=data.get("id"),
-        title=data["title"],
-        description=data.get("description"),
-        duration_seconds=data.get("duration_seconds"),
-        format=data.get("format") or "video",
-        course_type=data.get("course_type") or "self_paced",
-        learning_goals=data.get("learning_goals"),
-        rating_avg=data.get("rating_avg") or 0.0,
-        requires_certificate=bool(data.get("requires_certificate") or False),
-        title_image=str(data["title_image"]) if data.get("title_image") else None,
-        thumbnail_url=str(data["thumbnail_url"]) if data.get("thumbnail_url") else None,
-        download_url=str(data["download_url"]) if data.get("download_url") else None,
-        is_downloaded=bool(data.get("is_downloaded") or False),
-    )
+    course = models.Course(**course_values(payload))
 
-    _set_tags(course, data.get("tags"))
+    _set_tags(course, payload.tags)
 
     course.progress = models.CourseProgress(progress=0)
 
     db.add(course)
+    db.flush()
+    search_service.index_course(course, db)
     db.commit()
     db.refresh(course)
     return course
 
 
-def list_courses(db: Session, user_id) -> list[schemas.CourseDetailResponse]:
-    courses = (
-        db.query(models.Course)
-        .order_by(models.Course.created_at.asc())
-        .all()
-    )
-    return [_to_detail(course, user_id) for course in courses]
+async def create_course(payload: schemas.CourseCreate, db: DbSession) -> models.Course:
+    course = await run_db(db, lambda s: _insert_course(payload, s))
+    await invalidate_course(course.id)
+    await retrieval_service.index_course(course.id, retrieval_service.course_text(
+        payload.title, payload.description, payload.learning_goals, payload.tags))
+    return course
+
+
+def _catalog_page(
+    db: Session,
+    user_id,
+    *,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None,
+    order: str = "asc",
+    format: Optional[str] = None,
+    course_type: Optional[str] = None,
+    tag: Optional[str] = None,
+    requires_certificate: Optional[bool] = None,
+    min_rating: Optional[float] = None,
+    sort: str = "created_at",
+) -> tuple[list, Optional[int]]:
+    query = _catalog_rows(db, user_id)
+    # Both keys are indexed together with id: (created_at, id) and (rating_avg, id)
+    key = models.Course.rating_avg if sort == "rating" else models.Course.created_at
+
+    if format is not None:
+        query = query.filter(models.Course.format == format)
+    if course_type is not None:
+        query = query.filter(models.Course.course_type == course_type)
+    if requires_certificate is not None:
+        query = query.filter(models.Course.requires_certificate == requires_certificate)
+    if min_rating is not None:
+        query = query.filter(models.Course.rating_avg >= min_rating)
+    if tag is not None:
+        query = query.filter(
+            models.Course.id.in_(select(models.CourseTag.course_id).where(models.CourseTag.tag == tag.strip()))
+        )
+
+    descending = order == "desc"
+    if cursor is not None:
+        # Compare against the anchor row's own key so the key never round-trips through the client
+        # (sorting by rating, a rating submitted between two pages can move a course across the cursor)
+        anchor = select(key).where(models.Course.id == cursor).scalar_subquery()
+        if descending:
+            query = query.filter(or_(key < anchor, and_(key == anchor, models.Course.id < cursor)))
+        else:
+            query = query.filter(or_(key > anchor, and_(key == anchor, models.Course.id > cursor)))
+
+    if descending:
+        query = query.order_by(key.desc(), models.Course.id.desc())
+    else:
+        query = query.order_by(key.asc(), models.Course.id.asc())
+
+    if limit is not None:
+        query = query.limit(limit + 1)
+    rows = query.all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    return rows, next_cursor
+
+
+async def list_courses(db: DbSession, user_id: int,
+                       **filters) -> tuple[list[schemas.CourseDetailResponse], Optional[int]]:
+    """List the catalog in (created_at, id) or, with ``sort="rating"``, (rating_avg, id) order, one keyset page at a time.
+
+    ``cursor`` is the id of the last course of the previous page; the returned
+    cursor is ``None`` once the last page has been reached.
+    """
+    rows, next_cursor = await run_db(db, lambda s: _catalog_page(s, user_id, **filters))
+    bases = await _course_bases(db, {row.id: row.updated_at for row in rows})
+    courses = [
+        _with_progress(bases[row.id], row.progress, row.is_downloaded)
+        for row in rows
+        if row.id in bases
+    ]
+    return courses, next_cursor
 
 
 def get_course(course_id: int, db: Session) -> type[Course]:
@@ -113,26 +301,103 @@ def get_course(course_id: int, db: Session) -> type[Course]:
     return course
 
 
-def get_course_detail(course_id: int, user_id: int, db: Session) -> schemas.CourseDetailResponse:
-    course = (
-        db.query(models.Course)
+class CourseState(NamedTuple):
+    """The columns a course detail response depends on, cheap enough to read before building it."""
+    course_id: int
+    user_id: int
+    updated_at: Any
+    progress: Optional[float]
+    is_downloaded: Optional[bool]
+
+    @property
+    def etag(self) -> str:
+        return weak_etag("course", *self)
+
+
+def _course_state(course_id: int, user_id: int, db: Session) -> Optional[CourseState]:
+    row = (
+        db.query(models.Course.updated_at, models.CourseProgress.progress, models.CourseProgress.is_downloaded)
+        .outerjoin(
+            models.CourseProgress,
+            and_(
+                models.CourseProgress.course_id == models.Course.id,
+                models.CourseProgress.user_id == user_id,
+            ),
+        )
         .filter(models.Course.id == course_id)
         .first()
     )
-    if not course:
+    if not row:
+        return None
+    return CourseState(course_id, user_id, row.updated_at, row.progress, row.is_downloaded)
+
+
+async def get_course_state(course_id: int, user_id: int, db: DbSession) -> CourseState:
+    state = await run_db(db, lambda s: _course_state(course_id, user_id, s))
+    if not state:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    return state
+
+
+async def get_course_detail(course_id: int, user_id: int, db: DbSession,
+                            state: Optional[CourseState] = None) -> schemas.CourseDetailResponse:
+    state = state or await get_course_state(course_id, user_id, db)
+    base = (await _course_bases(db, {course_id: state.updated_at})).get(course_id)
+    if not base:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
-    return _to_detail(course, user_id)
+    return _with_progress(base, state.progress, state.is_downloaded)
+
+
+def _catalog_version(db: Session, user_id: int) -> tuple:
+    # Aggregates only: served from the updated_at indexes, no course or progress rows are loaded
+    count, newest = db.execute(select(func.count(models.Course.id), func.max(models.Course.updated_at))).one()
+    progress = (
+        select(func.count(), func.max(models.CourseProgress.updated_at))
+        .where(models.CourseProgress.user_id == user_id)
+    )
+    version = (count, newest, *db.execute(progress).one())
+    if newest is not None and newest > datetime.utcnow() - models.COURSE_LATE_COMMIT:
+        # A late commit stamped behind ``newest`` would not change these aggregates: until course
+        # writes have settled, every response gets an ETag of its own and nothing revalidates
+        version += (uuid4().hex,)
+    return version
 
 
-def get_course_download(course_id: int, db: Session) -> schemas.CourseDownloadOut:
+async def catalog_etag(db: DbSession, user_id: int, query: str) -> str:
+    """ETag for one catalog page: any course change or any change to the caller's progress alters it."""
+    version = await run_db(db, lambda s: _catalog_version(s, user_id))
+    return weak_etag("catalog", user_id, query, *version)
+
+
+def _local_course_file(course: models.Course) -> Optional[Path]:
+    if not course.download_url:
+        return None
+    path = Path(course.download_url).resolve()
+    if not path.is_relative_to(UPLOAD_ROOT.resolve()) or not path.is_file():
+        return None
+    return path
+
+
+def get_course_download(course_id: int, db: Session, file_url: Optional[str] = None) -> schemas.CourseDownloadOut:
     course = get_course(course_id, db)
     dumb_url = "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/BigBuckBunny.mp4"
     if not course.download_url:
         raise HTTPException(status_code=404, detail="Descarga no disponible para este curso")
+    if file_url and _local_course_file(course):
+        return schemas.CourseDownloadOut(course_id=course.id, download_url=file_url)
     return schemas.CourseDownloadOut(course_id=course.id, download_url=dumb_url)
 
 
-def get_progress(course_id: int, db: Session, user_id: int) -> schemas.CourseProgressOut:
+def get_course_file(course_id: int, db: Session) -> tuple[Path, Optional[str]]:
+    """Return the stored file of an uploaded course and its SHA-256."""
+    course = get_course(course_id, db)
+    path = _local_course_file(course)
+    if not path:
+        raise HTTPException(status_code=404, detail="Archivo no disponible para este curso")
+    return path, course.file_sha256
+
+
+def _get_progress(course_id: int, db: Session, user_id: int) -> schemas.CourseProgressOut:
     course = get_course(course_id, db)
     progress = (
         db.query(models.CourseProgress)
@@ -151,33 +416,53 @@ def get_progress(course_id: int, db: Session, user_id: int) -> schemas.CoursePro
     )
 
 
-def upsert_progress(course_id: int, payload: schemas.CourseProgressIn, db: Session,
-                    user_id: int) -> schemas.CourseProgressOut:
-    course = get_course(course_id, db)
+def _ensure_progress_rows(keys: list[tuple[int, int]], db: Session) -> None:
+    """Create the missing (user_id, course_id) progress rows at 0%, which counts for nothing on the dashboard.
 
-    if payload.progress is not None and not (0 <= payload.progress <= 100):
-        raise HTTPException(status_code=422, detail="progress debe estar entre 0 y 100")
+    With every row present, ``FOR UPDATE`` has something to lock on Postgres; on SQLite the INSERT
+    itself takes the database write lock (reads, FOR UPDATE included, never do). Either way the
+    state read after this is the "before" of the dashboard delta and stays so until commit.
+    Keys are sorted so concurrent writers lock shared rows in the same order.
+    """
+    now = datetime.utcnow()
+    upsert(db, models.CourseProgress.__table__, [
+        {"user_id": user_id, "course_id": course_id, "progress": 0, "is_downloaded": False, "updated_at": now}
+        for user_id, course_id in sorted(keys)
+    ], ["course_id", "user_id"])
 
-    progress = (
+
+def _locked_progress(course_id: int, user_id: int, db: Session) -> models.CourseProgress:
+    _ensure_progress_rows([(user_id, course_id)], db)
+    return (
         db.query(models.CourseProgress)
         .filter(
-            models.CourseProgress.course_id == course.id,
+            models.CourseProgress.course_id == course_id,
             models.CourseProgress.user_id == user_id,
         )
-        .one_or_none()
+        .with_for_update()
+        .one()
     )
 
-    if progress:
-        if payload.progress is not None:
-            progress.progress = payload.progress
-    else:
-        progress = models.CourseProgress(
-            course_id=course.id,
-            user_id=user_id,
-            progress=payload.progress or 0,
-        )
-        db.add(progress)
 
+def _upsert_progress(course_id: int, payload: schemas.CourseProgressIn, db: Session,
+                     user_id: int) -> schemas.CourseProgressOut:
+    course = get_course(course_id, db)
+
+    if payload.progress is not None and not (0 <= payload.progress <= 100):
+        raise HTTPException(status_code=422, detail="progress debe estar entre 0 y 100")
+
+    progress = _locked_progress(course.id, user_id, db)
+    before = (progress.progress, progress.is_downloaded)
+
+    if payload.progress is not None:
+        progress.progress = payload.progress
+        progress.client_updated_at = datetime.utcnow()
+
+    dashboard_service.apply_changes(
+        [dashboard_service.ProgressChange(user_id, course.duration_seconds, *before, progress.progress,
+                                          progress.is_downloaded)],
+        db,
+    )
     db.commit()
     db.refresh(progress)
     return schemas.CourseProgressOut(
@@ -187,7 +472,7 @@ def upsert_progress(course_id: int, payload: schemas.CourseProgressIn, db: Sessi
     )
 
 
-def update_download_status(
+def _update_download_status(
     course_id: int,
     user_id: int,
     payload: schemas.CourseDownloadStatusIn,
@@ -196,27 +481,17 @@ def update_download_status(
     """Update the download status for a specific user and course."""
     course = get_course(course_id, db)
 
-    progress = (
-        db.query(models.CourseProgress)
-        .filter(
-            models.CourseProgress.course_id == course.id,
-            models.CourseProgress.user_id == user_id,
-        )
-        .one_or_none()
-    )
+    progress = _locked_progress(course.id, user_id, db)
+    before = (progress.progress, progress.is_downloaded)
 
-    if progress:
-        progress.is_downloaded = payload.is_downloaded
-    else:
-        # Create progress record if it doesn't exist
-        progress = models.CourseProgress(
-            course_id=course.id,
-            user_id=user_id,
-            progress=0,
-            is_downloaded=payload.is_downloaded,
-        )
-        db.add(progress)
+    progress.is_downloaded = payload.is_downloaded
+    progress.client_updated_at = datetime.utcnow()
 
+    dashboard_service.apply_changes(
+        [dashboard_service.ProgressChange(user_id, course.duration_seconds, *before, progress.progress,
+                                          progress.is_downloaded)],
+        db,
+    )
     db.commit()
     db.refresh(progress)
     return schemas.CourseProgressOut(
@@ -226,27 +501,303 @@ def update_download_status(
     )
 
 
-UPLOAD_ROOT = Path("uploads/courses")
+def _as_utc(ts: datetime) -> datetime:
+    # Stored naive in UTC, like every other timestamp column
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def bulk_upsert_progress(entries: Iterable[dict], db: Session) -> int:
+    """Apply progress entries with one ``INSERT ... ON CONFLICT`` per field combination.
+
+    Each entry has ``user_id``, ``course_id``, ``client_updated_at`` and ``progress`` and/or
+    ``is_downloaded``. Entries for the same row are merged first (the newest value of each field
+    wins), then a row is only overwritten if the stored ``client_updated_at`` is older.
+    The users' dashboards are updated in the same transaction.
+    Returns the number of entries that were applied. The caller commits.
+    """
+    merged: dict[tuple[int, int], dict] = {}
+    for entry in sorted(entries, key=lambda e: e["client_updated_at"]):
+        row = merged.setdefault((entry["user_id"], entry["course_id"]), {})
+        row.update({k: v for k, v in entry.items() if v is not None})
+
+    now = datetime.utcnow()
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for row in merged.values():
+        fields = tuple(f for f in ("progress", "is_downloaded") if f in row)
+        groups.setdefault(fields, []).append(row)
+
+    if not merged:
+        return 0
+    table = models.CourseProgress.__table__
+    # Current state of the touched rows, locked, to turn the applied writes into dashboard deltas
+    _ensure_progress_rows(list(merged), db)
+    before = {
+        (r.user_id, r.course_id): (r.progress, r.is_downloaded)
+        for r in db.execute(
+            select(table.c.user_id, table.c.course_id, table.c.progress, table.c.is_downloaded)
+            .where(tuple_(table.c.user_id, table.c.course_id).in_(list(merged)))
+            .order_by(table.c.user_id, table.c.course_id)
+            .with_for_update()
+        )
+    }
+    durations = dict(db.execute(
+        select(models.Course.id, models.Course.duration_seconds)
+        .where(models.Course.id.in_({course_id for _, course_id in merged}))
+    ).all())
+
+    changes = []
+    for fields, rows in groups.items():
+        values = [
+            {
+                "user_id": row["user_id"],
+                "course_id": row["course_id"],
+                "progress": row.get("progress", 0),
+                "is_downloaded": row.get("is_downloaded", False),
+                "client_updated_at": row["client_updated_at"],
+                "updated_at": now,
+            }
+            for row in rows
+        ]
+        written = upsert(
+            db, table, values, ["course_id", "user_id"],
+            set_=lambda excluded: {
+                **{f: excluded[f] for f in fields},
+                "client_updated_at": excluded.client_updated_at,
+                "updated_at": excluded.updated_at,
+            },
+            where=lambda excluded: or_(
+                table.c.client_updated_at.is_(None),
+                table.c.client_updated_at <= excluded.client_updated_at,
+            ),
+            returning=(table.c.user_id, table.c.course_id, table.c.progress, table.c.is_downloaded),
+        )
+        # Only inserted or updated rows come back; writes that lost last-writer-wins do not
+        for r in written:
+            changes.append(dashboard_service.ProgressChange(
+                r.user_id, durations.get(r.course_id), *before[(r.user_id, r.course_id)],
+                r.progress, r.is_downloaded,
+            ))
+    dashboard_service.apply_changes(changes, db)
+    return len(changes)
+
+
+def _sync_progress(user_id: int, payload: schemas.CourseProgressSyncIn, db: Session) -> schemas.CourseProgressSyncOut:
+    course_ids = {item.course_id for item in payload.items}
+    known = set(db.scalars(select(models.Course.id).where(models.Course.id.in_(course_ids))))
+
+    applied = bulk_upsert_progress(
+        (
+            {
+                "user_id": user_id,
+                "course_id": item.course_id,
+                "progress": item.progress,
+                "is_downloaded": item.is_downloaded,
+                "client_updated_at": _as_utc(item.client_timestamp),
+            }
+            for item in payload.items
+            if item.course_id in known and (item.progress is not None or item.is_downloaded is not None)
+        ),
+        db,
+    ) if known else 0
+    db.commit()
 
+    rows = db.execute(
+        select(models.CourseProgress.course_id, models.CourseProgress.progress, models.CourseProgress.is_downloaded)
+        .where(models.CourseProgress.user_id == user_id, models.CourseProgress.course_id.in_(known))
+    ).all()
+    return schemas.CourseProgressSyncOut(
+        applied=applied,
+        unknown_course_ids=sorted(course_ids - known),
+        progress=[
+            schemas.CourseProgressOut(course_id=r.course_id, progress=r.progress, is_downloaded=bool(r.is_downloaded))
+            for r in rows
+        ],
+    )
 
-async def upload_course_file(course_id, file, db):
-    course = get_course(course_id, db)
 
-    dest_dir = UPLOAD_ROOT / str(course.id)
-    dest_dir.mkdir(parents=True, exist_ok=True)
+def _write_progress(entries: list[dict], db: Session) -> None:
+    bulk_upsert_progress(entries, db)
+    db.commit()
+
+
+async def start_progress_buffer(app: FastAPI):
+    if progress_buffer is None:
+        return
+
+    async def flush(entries: list[dict]):
+        async with open_db(app) as db:
+            await run_db(db, lambda s: _write_progress(entries, s))
+
+    progress_buffer.start(flush)
+
+
+async def stop_progress_buffer():
+    if progress_buffer is not None:
+        await progress_buffer.stop()
 
-    # Save file locally
-    file_ext = os.path.splitext(file.filename)[1]
-    safe_name = f"course{file_ext or ''}"
-    file_path = dest_dir / safe_name
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+def _with_pending(out: schemas.CourseProgressOut, user_id: int) -> schemas.CourseProgressOut:
+    pending = progress_buffer.pending((user_id, out.course_id)) if progress_buffer else None
+    if not pending:
+        return out
+    return out.model_copy(update={k: pending[k] for k in ("progress", "is_downloaded") if k in pending})
 
+
+def _buffer_progress(user_id: int, course_id: int, **fields) -> None:
+    progress_buffer.put(
+        (user_id, course_id),
+        {"user_id": user_id, "course_id": course_id, "client_updated_at": datetime.utcnow(), **fields},
+    )
+
+
+async def get_progress(course_id: int, db: DbSession, user_id: int) -> schemas.CourseProgressOut:
+    out = await run_db(db, lambda s: _get_progress(course_id, s, user_id=user_id))
+    return _with_pending(out, user_id)
+
+
+async def upsert_progress(course_id: int, payload: schemas.CourseProgressIn, db: DbSession,
+                          user_id: int) -> schemas.CourseProgressOut:
+    if progress_buffer is None:
+        return await run_db(db, lambda s: _upsert_progress(course_id, payload, s, user_id=user_id))
+
+    current = await get_progress(course_id, db, user_id)
+    if payload.progress is not None and not (0 <= payload.progress <= 100):
+        raise HTTPException(status_code=422, detail="progress debe estar entre 0 y 100")
+    if payload.progress is None:
+        return current
+    _buffer_progress(user_id, course_id, progress=payload.progress)
+    return _with_pending(current, user_id)
+
+
+async def update_download_status(course_id: int, user_id: int, payload: schemas.CourseDownloadStatusIn,
+                                 db: DbSession) -> schemas.CourseProgressOut:
+    if progress_buffer is None:
+        return await run_db(db, lambda s: _update_download_status(course_id, user_id, payload, s))
+
+    current = await get_progress(course_id, db, user_id)
+    _buffer_progress(user_id, course_id, is_downloaded=payload.is_downloaded)
+    return _with_pending(current, user_id)
+
+
+async def sync_progress(user_id: int, payload: schemas.CourseProgressSyncIn,
+                        db: DbSession) -> schemas.CourseProgressSyncOut:
+    out = await run_db(db, lambda s: _sync_progress(user_id, payload, s))
+    if progress_buffer is not None:
+        out.progress = [_with_pending(p, user_id) for p in out.progress]
+    return out
+
+
+UPLOAD_ROOT = Path(os.getenv("UPLOAD_ROOT", "uploads/courses"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "4096")) * 1024 * 1024
+# Multipart framing (boundary lines, part headers) allowed on top of the file in Content-Length
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def read_chunks(src: BinaryIO) -> Iterator[bytes]:
+    while chunk := src.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+def store_course_file(chunks: Iterable[bytes], course_id: int, file_name: str) -> tuple[Path, str, int]:
+    """Write ``chunks`` to ``UPLOAD_ROOT/<course_id>/<file_name>``, hashing on the fly.
+
+    Data goes to a temp file in the same directory and is renamed into place,
+    so readers never see a partial file.
+    """
+    dest_dir = UPLOAD_ROOT / str(course_id)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+                digest.update(chunk)
+                out.write(chunk)
+        file_path = dest_dir / file_name
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    return file_path, digest.hexdigest(), size
+
+
+def _write_hashed(out, digest, data: bytes) -> None:
+    digest.update(data)
+    out.write(data)
+
+
+async def write_stream(chunks: AsyncIterator[bytes], dest_dir: Path, dest_path: Path, max_size: int,
+                       too_large: str) -> tuple[str, int]:
+    """Async counterpart of ``store_course_file`` for request bodies: 413 with ``too_large`` past ``max_size``."""
+    await run_in_threadpool(dest_dir.mkdir, parents=True, exist_ok=True)
+    fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=dest_dir, prefix=".upload-", suffix=".part")
+    out = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    try:
+        # Request body chunks are small; batch them so each thread hop writes ~1 MiB
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=too_large)
+            buffer += chunk
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                await run_in_threadpool(_write_hashed, out, digest, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write_hashed, out, digest, bytes(buffer))
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(os.replace, tmp_path, dest_path)
+    except BaseException:
+        out.close()
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    return digest.hexdigest(), size
+
+
+def course_file_name(original_name: Optional[str]) -> str:
+    file_ext = os.path.splitext(original_name or "")[1]
+    return f"course{file_ext or ''}"
+
+
+def attach_course_file(course_id: int, file_path: Path, sha256: str, size: int, db: Session) -> models.Course:
+    course = get_course(course_id, db)
     # Store local path as download_url (relative or absolute)
     # For now, local path; in the future, replace with GCP bucket URL.
     course.download_url = str(file_path)
+    course.file_sha256 = sha256
+    course.file_size = size
     db.commit()
     db.refresh(course)
+    return course
 
+
+async def upload_course_file(course_id: int, headers: Mapping[str, str], chunks: AsyncIterator[bytes],
+                             db: DbSession) -> models.Course:
+    # A body that announces more than the limit is refused before a byte of it is read
+    declared = headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+    course = await run_db(db, lambda s: get_course(course_id, s))
+
+    # The multipart body is parsed as it arrives and the file goes straight to its destination:
+    # nothing is spooled first, and the size limit stops the read (chunked bodies included)
+    try:
+        upload = MultipartFile(headers.get("content-type"), chunks, "file")
+        file_path = UPLOAD_ROOT / str(course.id) / course_file_name(await upload.open())
+        sha256, size = await write_stream(
+            upload.read(), file_path.parent, file_path, MAX_UPLOAD_BYTES, "Archivo demasiado grande"
+        )
+    except MultipartError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    course = await run_db(db, lambda s: attach_course_file(course.id, file_path, sha256, size, s))
+    await invalidate_course(course.id)
     return course
@@ -0,0 +1,154 @@
+import os
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+from fastapi import FastAPI
+from sqlalchemy import DateTime, case, delete, func, insert, literal, select, text
+from sqlalchemy.orm import Session
+
+from app.config.settings import DbSession, open_db, run_db
+from app.model import model as models
+from app.schema import schema as schemas
+from app.util.log_time import log_time
+from app.util.periodic import PeriodicJob
+from app.util.sql import upsert
+
+# The incremental updates keep the totals exact; the periodic rebuild only repairs drift
+# (rows written around the dashboard code, float rounding in learning_seconds)
+REBUILD_SECONDS = float(os.getenv("DASHBOARD_REBUILD_SECONDS", "86400"))
+
+_COUNTERS = ("in_progress", "completed", "downloaded", "learning_seconds")
+
+_job: Optional[PeriodicJob] = None
+
+
+class ProgressChange(NamedTuple):
+    """One course_progress row before (``None``, or the 0% row a write creates, if it did not exist) and after a write."""
+    user_id: int
+    duration_seconds: Optional[int]
+    old_progress: Optional[float]
+    old_downloaded: Optional[bool]
+    new_progress: float
+    new_downloaded: bool
+
+
+def _contribution(progress: Optional[float], downloaded: Optional[bool], duration_seconds: Optional[int]) -> tuple:
+    progress = progress or 0.0
+    return (
+        1 if 0 < progress < 100 else 0,
+        1 if progress >= 100 else 0,
+        1 if downloaded else 0,
+        (duration_seconds or 0) * progress / 100.0,
+    )
+
+
+def apply_changes(changes: Iterable[ProgressChange], db: Session) -> None:
+    """Add the effect of progress writes to the users' dashboards, in the caller's transaction.
+
+    One ``INSERT ... ON CONFLICT DO UPDATE SET x = x + delta`` for all users (row by row on
+    databases without it), so concurrent writers add up instead of overwriting each other.
+    The caller commits.
+    """
+    deltas: dict[int, list] = {}
+    for ch in changes:
+        before = _contribution(ch.old_progress, ch.old_downloaded, ch.duration_seconds)
+        after = _contribution(ch.new_progress, ch.new_downloaded, ch.duration_seconds)
+        total = deltas.setdefault(ch.user_id, [0, 0, 0, 0.0])
+        for i, (a, b) in enumerate(zip(after, before)):
+            total[i] += a - b
+    rows = [
+        {"user_id": user_id, **dict(zip(_COUNTERS, delta))}
+        for user_id, delta in deltas.items()
+        if any(delta)
+    ]
+    if not rows:
+        return
+
+    table = models.UserDashboard.__table__
+    now = datetime.utcnow()
+    upsert(
+        db, table, [{**row, "updated_at": now} for row in rows], ["user_id"],
+        set_=lambda excluded: {
+            **{c: table.c[c] + excluded[c] for c in _COUNTERS},
+            "updated_at": excluded.updated_at,
+        },
+    )
+
+
+def _rebuild(db: Session) -> int:
+    P, C = models.CourseProgress, models.Course
+    table = models.UserDashboard.__table__
+    if db.get_bind().dialect.name == "postgresql":
+        # Waits for in-flight progress writes (and their dashboard deltas) to commit and holds off new ones
+        db.execute(text("LOCK TABLE course_progress IN SHARE MODE"))
+    totals = (
+        select(
+            P.user_id,
+            func.sum(case(((P.progress > 0) & (P.progress < 100), 1), else_=0)),
+            func.sum(case((P.progress >= 100, 1), else_=0)),
+            func.sum(case((P.is_downloaded, 1), else_=0)),
+            func.sum(func.coalesce(C.duration_seconds, 0) * P.progress / 100.0),
+            literal(datetime.utcnow(), DateTime),
+        )
+        .join(C, C.id == P.course_id)
+        .group_by(P.user_id)
+    )
+    db.execute(delete(table))
+    db.execute(insert(table).from_select(["user_id", *_COUNTERS, "updated_at"], totals))
+    db.commit()
+    return db.scalar(select(func.count()).select_from(table))
+
+
+def _missing(db: Session) -> bool:
+    """Progress exists but no dashboard row does: the table is new (first deploy) and must be filled."""
+    has_progress = db.scalar(select(models.CourseProgress.user_id).limit(1)) is not None
+    has_dashboards = db.scalar(select(models.UserDashboard.user_id).limit(1)) is not None
+    return has_progress and not has_dashboards
+
+
+async def rebuild_dashboards(app: FastAPI) -> int:
+    async with open_db(app) as db:
+        users = await run_db(db, _rebuild)
+    log_time(f"📊:       Dashboards rebuilt ({users} users)")
+    return users
+
+
+async def _fill_missing(app: FastAPI):
+    async with open_db(app) as db:
+        missing = await run_db(db, _missing)
+    if missing:
+        await rebuild_dashboards(app)
+
+
+def start_dashboard_job(app: FastAPI):
+    global _job
+    if _job is None:
+        _job = PeriodicJob(lambda: rebuild_dashboards(app), REBUILD_SECONDS, "Dashboard rebuild failed",
+                           first=lambda: _fill_missing(app))
+        _job.start()
+
+
+async def stop_dashboard_job():
+    global _job
+    if _job is not None:
+        await _job.stop()
+        _job = None
+
+
+def _get_dashboard(user_id: int, db: Session) -> schemas.UserDashboardOut:
+    row = db.get(models.UserDashboard, user_id)
+    if row is None:
+        # No progress yet: nothing to count
+        return schemas.UserDashboardOut(user_id=user_id, in_progress=0, completed=0, downloaded=0, learning_seconds=0)
+    return schemas.UserDashboardOut(
+        user_id=user_id,
+        in_progress=row.in_progress,
+        completed=row.completed,
+        downloaded=row.downloaded,
+        learning_seconds=round(row.learning_seconds),
+        updated_at=row.updated_at,
+    )
+
+
+async def get_dashboard(user_id: int, db: DbSession) -> schemas.UserDashboardOut:
+    return await run_db(db, lambda s: _get_dashboard(user_id, s))
@@ -0,0 +1,149 @@
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config.settings import DbSession, open_db, run_db
+from app.model import model as models
+from app.schema import schema as schemas
+from app.service import course_service
+from app.util.log_time import log_time
+from app.util.periodic import PeriodicJob
+
+# Submissions keep the aggregates exact up to float rounding; reconciliation recomputes the courses
+# that drifted anyway (ratings written or deleted around rating_service)
+RECONCILE_SECONDS = float(os.getenv("RATING_RECONCILE_SECONDS", "3600"))
+AVG_TOLERANCE = 1e-6
+
+_job: Optional[PeriodicJob] = None
+
+
+def _lock_course(course_id: int, db: Session) -> bool:
+    """Touch the course row, which takes its row lock (the database write lock on SQLite) until commit.
+
+    Every aggregate writer goes through here before reading ratings, so writers of the same course
+    apply one after the other. Bumping updated_at also makes the course cache, the catalog ETag and
+    the tag index see the new rating.
+    """
+    courses = models.Course.__table__
+    return db.execute(
+        update(courses).where(courses.c.id == course_id).values(updated_at=datetime.utcnow())
+    ).rowcount > 0
+
+
+def _recount(course_id: int, db: Session) -> tuple[float, int]:
+    """Store the course's average and count recomputed from course_ratings; the caller holds _lock_course."""
+    n, avg = db.execute(
+        select(func.count(), func.avg(models.CourseRating.rating))
+        .where(models.CourseRating.course_id == course_id)
+    ).one()
+    rating_avg = float(avg) if n else 0.0
+    courses = models.Course.__table__
+    db.execute(update(courses).where(courses.c.id == course_id).values(rating_avg=rating_avg, rating_count=n))
+    return rating_avg, n
+
+
+def _rate_course(course_id: int, user_id: int, rating: int, db: Session) -> schemas.CourseRatingOut:
+    # Checked up front: the foreign key would only fail at commit, as a 500
+    if db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    if not _lock_course(course_id, db):
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+
+    current = db.get(models.CourseRating, (course_id, user_id))
+    if current is None:
+        db.add(models.CourseRating(course_id=course_id, user_id=user_id, rating=rating))
+        added_sum, added_count = rating, 1
+    else:
+        added_sum, added_count = rating - current.rating, 0
+        current.rating = rating
+
+    # O(1): fold the change into the stored mean instead of averaging course_ratings again
+    courses = models.Course.__table__
+    count = courses.c.rating_count + added_count
+    folded = (courses.c.rating_avg * courses.c.rating_count + added_sum) / func.nullif(count, 0)
+    stmt = (
+        update(courses)
+        .where(courses.c.id == course_id)
+        .values(rating_avg=func.coalesce(folded, courses.c.rating_avg), rating_count=count)
+    )
+    if db.get_bind().dialect.update_returning:
+        rating_avg, rating_count = db.execute(stmt.returning(courses.c.rating_avg, courses.c.rating_count)).one()
+    else:
+        # No UPDATE ... RETURNING (MySQL): the row is ours since _lock_course, so reading it back is exact
+        db.execute(stmt)
+        rating_avg, rating_count = db.execute(
+            select(courses.c.rating_avg, courses.c.rating_count).where(courses.c.id == course_id)
+        ).one()
+    if not rating_count:
+        # A replaced rating on a course stored with no ratings: the aggregates drifted and there is no
+        # mean to fold into (NULLIF kept the update from dividing by zero), so recount the course
+        db.flush()
+        rating_avg, rating_count = _recount(course_id, db)
+    db.commit()
+    return schemas.CourseRatingOut(course_id=course_id, user_id=user_id, rating=rating,
+                                   rating_avg=round(rating_avg, 2), rating_count=rating_count)
+
+
+async def rate_course(course_id: int, user_id: int, payload: schemas.CourseRatingIn,
+                      db: DbSession) -> schemas.CourseRatingOut:
+    """Submit (or replace) the user's rating of a course and update the course's average and count."""
+    result = await run_db(db, lambda s: _rate_course(course_id, user_id, payload.rating, s))
+    await course_service.invalidate_course(course_id)
+    return result
+
+
+def _drifted(db: Session) -> list[int]:
+    R, courses = models.CourseRating, models.Course.__table__
+    totals = (
+        select(R.course_id, func.count().label("n"), func.avg(R.rating).label("avg"))
+        .group_by(R.course_id)
+        .subquery()
+    )
+    return list(db.scalars(
+        select(courses.c.id)
+        .outerjoin(totals, totals.c.course_id == courses.c.id)
+        .where(or_(
+            courses.c.rating_count != func.coalesce(totals.c.n, 0),
+            func.abs(courses.c.rating_avg - totals.c.avg) > AVG_TOLERANCE,
+        ))
+    ))
+
+
+def _reconcile(db: Session) -> list[int]:
+    """Recompute the aggregates of the courses whose stored values disagree with course_ratings."""
+    fixed = []
+    for course_id in _drifted(db):
+        # Under the same lock as submissions, so none is lost between the recount and the write
+        if not _lock_course(course_id, db):
+            continue
+        _recount(course_id, db)
+        db.commit()
+        fixed.append(course_id)
+    return fixed
+
+
+async def reconcile_ratings(app: FastAPI) -> list[int]:
+    async with open_db(app) as db:
+        drifted = await run_db(db, _reconcile)
+    if drifted:
+        await course_service.invalidate_course(*drifted)
+        log_time(f"⭐:       Ratings reconciled ({len(drifted)} courses)")
+    return drifted
+
+
+def start_rating_job(app: FastAPI):
+    global _job
+    if _job is None:
+        _job = PeriodicJob(lambda: reconcile_ratings(app), RECONCILE_SECONDS, "Rating reconciliation failed")
+        _job.start()
+
+
+async def stop_rating_job():
+    global _job
+    if _job is not None:
+        await _job.stop()
+        _job = None
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from scipy import sparse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config.settings import DbSession, open_db, run_db
+from app.model import model as models
+from app.schema import schema as schemas
+from app.service import course_service
+from app.util.log_time import log_time
+from app.util.periodic import PeriodicJob
+from app.util.similarity import item_neighbors, score_from_neighbors
+
+REBUILD_SECONDS = float(os.getenv("RECOMMENDER_REBUILD_SECONDS", "3600"))
+NEIGHBORS_K = int(os.getenv("RECOMMENDER_NEIGHBORS", "50"))
+TAG_WEIGHT = float(os.getenv("RECOMMENDER_TAG_WEIGHT", "0.3"))
+WATCHLIST_WEIGHT = 1.0
+WAIT_SECONDS = float(os.getenv("RECOMMENDER_WAIT_SECONDS", "10"))
+POPULAR_SIZE = 200
+
+
+@dataclass
+class ItemModel:
+    course_ids: np.ndarray  # sorted; position = item index
+    neighbors: np.ndarray  # items x k item indexes, -1 = empty slot
+    scores: np.ndarray  # items x k similarities
+    popular: np.ndarray  # item indexes by number of interactions, for users without history
+    built_at: float = field(default_factory=time.time)
+    build_seconds: float = 0.0
+    interactions: int = 0
+
+    def index_of(self, course_ids: np.ndarray) -> np.ndarray:
+        """Item indexes for ``course_ids``; -1 for courses the model has not seen."""
+        if not len(self.course_ids):
+            return np.full(len(course_ids), -1)
+        pos = np.searchsorted(self.course_ids, course_ids)
+        pos[pos >= len(self.course_ids)] = 0
+        return np.where(self.course_ids[pos] == course_ids, pos, -1)
+
+
+_model: Optional[ItemModel] = None
+_ready = asyncio.Event()
+_job: Optional[PeriodicJob] = None
+
+
+def _column_arrays(rows: list, *dtypes) -> list[np.ndarray]:
+    columns = list(zip(*rows)) if rows else [()] * len(dtypes)
+    return [np.asarray(col, dtype=dtype) for col, dtype in zip(columns, dtypes)]
+
+
+def _load_training_data(db: Session) -> dict:
+    P, W, T = models.CourseProgress, models.Watchlist, models.CourseTag
+    return {
+        "courses": db.scalars(select(models.Course.id).order_by(models.Course.id)).all(),
+        "progress": db.execute(select(P.user_id, P.course_id, P.progress)).all(),
+        "watchlist": db.execute(select(W.user_id, W.course_id)).all(),
+        "tags": db.execute(select(T.course_id, T.tag)).all(),
+    }
+
+
+def _build_model(data: dict) -> ItemModel:
+    started = time.perf_counter()
+    course_ids = np.asarray(data["courses"], dtype=np.int64)
+    model = ItemModel(course_ids, np.empty((0, 0), np.int32), np.empty((0, 0), np.float32), np.empty(0, np.int32))
+
+    p_users, p_courses, p_values = _column_arrays(data["progress"], np.int64, np.int64, np.float64)
+    w_users, w_courses = _column_arrays(data["watchlist"], np.int64, np.int64)
+    users = np.concatenate([p_users, w_users])
+    items = model.index_of(np.concatenate([p_courses, w_courses]))
+    # More progress means a stronger signal; a watchlist entry counts like an untouched course
+    weights = np.concatenate([1.0 + np.nan_to_num(p_values) / 100.0, np.full(len(w_users), WATCHLIST_WEIGHT)])
+    keep = items >= 0
+    _, user_index = np.unique(users[keep], return_inverse=True)
+    interactions = sparse.coo_matrix(
+        (weights[keep], (user_index, items[keep])), shape=(user_index.max(initial=-1) + 1, len(course_ids))
+    ).tocsr()  # duplicates (progress + watchlist) are summed
+
+    t_courses, t_tags = _column_arrays(data["tags"], np.int64, object)
+    t_items = model.index_of(t_courses)
+    t_keep = t_items >= 0
+    _, tag_index = np.unique(t_tags[t_keep].astype(str), return_inverse=True)
+    item_tags = sparse.coo_matrix(
+        (np.ones(t_keep.sum()), (t_items[t_keep], tag_index)), shape=(len(course_ids), tag_index.max(initial=-1) + 1)
+    ).tocsr()
+
+    model.neighbors, model.scores = item_neighbors(interactions, item_tags, k=NEIGHBORS_K, tag_weight=TAG_WEIGHT)
+    counts = np.bincount(items[keep], minlength=len(course_ids))
+    model.popular = np.argsort(-counts, kind="stable")[:POPULAR_SIZE].astype(np.int32)
+    model.interactions = int(keep.sum())
+    model.build_seconds = time.perf_counter() - started
+    return model
+
+
+async def rebuild(app: FastAPI) -> ItemModel:
+    global _model
+    async with open_db(app) as db:
+        data = await run_db(db, _load_training_data)
+    # CPU-bound; NumPy/SciPy release the GIL for the heavy parts
+    _model = await run_in_threadpool(_build_model, data)
+    _ready.set()
+    log_time(
+        f"🧠:       Recommendations rebuilt: {len(_model.course_ids)} courses, "
+        f"{_model.interactions} interactions in {_model.build_seconds:.2f}s"
+    )
+    return _model
+
+
+def start_recommender(app: FastAPI):
+    global _job
+    if _job is None:
+        _job = PeriodicJob(lambda: rebuild(app), REBUILD_SECONDS, "Recommendation rebuild failed",
+                           first=lambda: rebuild(app))
+        _job.start()
+
+
+async def stop_recommender():
+    global _job
+    if _job is not None:
+        await _job.stop()
+        _job = None
+
+
+def _user_history(user_id: int, db: Session) -> tuple[list, list]:
+    P, W = models.CourseProgress, models.Watchlist
+    progress = db.execute(select(P.course_id, P.progress).where(P.user_id == user_id)).all()
+    watchlist = db.scalars(select(W.course_id).where(W.user_id == user_id)).all()
+    return progress, watchlist
+
+
+def _recommend(model: ItemModel, progress: list, watchlist: list, limit: int) -> list[tuple[int, float]]:
+    course_ids = np.asarray([c for c, _ in progress] + list(watchlist), dtype=np.int64)
+    weights = np.asarray(
+        [1.0 + (p or 0) / 100.0 for _, p in progress] + [WATCHLIST_WEIGHT] * len(watchlist), dtype=np.float32
+    )
+    items = model.index_of(course_ids)
+    known = items >= 0
+    seen = set(items[known].tolist())
+
+    candidates, scores = score_from_neighbors(model.neighbors, model.scores, items[known], weights[known])
+    ranked = [(int(i), float(s)) for i, s in zip(candidates, scores) if int(i) not in seen]
+    ranked.sort(key=lambda x: (-x[1], x[0]))
+    picked = ranked[:limit]
+
+    # Not enough history (or new user): top up with popular courses
+    if len(picked) < limit:
+        taken = seen | {i for i, _ in picked}
+        picked += [(int(i), 0.0) for i in model.popular if int(i) not in taken][:limit - len(picked)]
+    return [(int(model.course_ids[i]), s) for i, s in picked]
+
+
+async def recommend_courses(user_id: int, db: DbSession, limit: int = 10) -> list[schemas.CourseRecommendationOut]:
+    progress, watchlist = await run_db(db, lambda s: _user_history(user_id, s))
+    try:
+        # Only the first requests after startup can get here before the initial build is done
+        await asyncio.wait_for(_ready.wait(), WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Recomendaciones no disponibles todavía",
+                            headers={"Retry-After": "5"})
+    ranked = _recommend(_model, progress, watchlist, limit)
+    summaries = await course_service.get_course_summaries([c for c, _ in ranked], db)
+    return [
+        schemas.CourseRecommendationOut(**summaries[c].model_dump(), score=round(s, 4))
+        for c, s in ranked
+        if c in summaries
+    ]
+
+
+def stats() -> dict:
+    if _model is None:
+        return {"ready": False}
+    return {
+        "ready": True,
+        "courses": len(_model.course_ids),
+        "interactions": _model.interactions,
+        "neighbors_k": int(_model.neighbors.shape[1]) if _model.neighbors.ndim == 2 else 0,
+        "built_at": _model.built_at,
+        "build_seconds": round(_model.build_seconds, 3),
+    }
@@ -0,0 +1,94 @@
+import os
+from typing import Iterable, Optional
+
+from fastapi import FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+
+from app.config.settings import open_db, run_db
+from app.model import model as models
+from app.util.log_time import log_time
+from app.util.retrieval import HybridIndex
+
+REBUILD_BATCH_SIZE = 1000
+
+# Shared by every worker on the host through the memory-mapped files under RETRIEVAL_INDEX_DIR
+retrieval_index = HybridIndex(
+    os.getenv("RETRIEVAL_INDEX_DIR", "data/retrieval"),
+    dim=int(os.getenv("RETRIEVAL_VECTOR_DIM", "128")),
+    merge_threshold=int(os.getenv("RETRIEVAL_MERGE_THRESHOLD", "2000")),
+)
+
+
+def course_text(title: Optional[str], description: Optional[str], learning_goals: Optional[Iterable],
+                tags: Optional[Iterable[str]]) -> str:
+    # The title goes in twice so it outweighs a long description
+    parts = [title or "", title or "", description or ""]
+    parts += [str(g) for g in learning_goals or []]
+    parts += list(tags or [])
+    return "\n".join(p for p in parts if p)
+
+
+def _documents(db: Session) -> Iterable[tuple[int, str]]:
+    last_id = 0
+    while True:
+        courses = db.scalars(
+            select(models.Course)
+            .options(selectinload(models.Course.tags))
+            .where(models.Course.id > last_id)
+            .order_by(models.Course.id)
+            .limit(REBUILD_BATCH_SIZE)
+        ).all()
+        if not courses:
+            return
+        for c in courses:
+            yield c.id, course_text(c.title, c.description, c.learning_goals, [t.tag for t in c.tags])
+        last_id = courses[-1].id
+        db.expunge_all()
+
+
+def rebuild_retrieval_index(db: Session) -> int:
+    return retrieval_index.build(_documents(db))
+
+
+def _ensure_retrieval_index(db: Session) -> Optional[int]:
+    retrieval_index.refresh()
+    courses = db.execute(select(func.count()).select_from(models.Course)).scalar_one()
+    if retrieval_index.n_docs == courses:
+        return None
+    return rebuild_retrieval_index(db)
+
+
+async def ensure_retrieval_index(app: FastAPI):
+    """Rebuild on startup when the index on disk does not cover the catalog (first run, or courses added elsewhere)."""
+    async with open_db(app) as db:
+        rebuilt = await run_db(db, _ensure_retrieval_index)
+    if rebuilt is not None:
+        log_time(f"🧭:       Retrieval index rebuilt ({rebuilt} courses)")
+
+
+async def index_course(course_id: int, text: str):
+    """Append a new course; call after its transaction committed."""
+    try:
+        await run_in_threadpool(retrieval_index.add, course_id, text)
+    except OSError as exc:
+        # The course exists either way; the next startup sees the count mismatch and rebuilds
+        log_time(f"⚠️:       Retrieval index update failed for course {course_id}: {exc!r}")
+
+
+async def index_courses(docs: list[tuple[int, str]]):
+    """Append many new courses at once (bulk import); same failure handling as ``index_course``."""
+    try:
+        await run_in_threadpool(retrieval_index.add_many, docs)
+    except OSError as exc:
+        log_time(f"⚠️:       Retrieval index update failed for {len(docs)} courses: {exc!r}")
+
+
+async def retrieve_courses(query: str, k: int = 5) -> list[tuple[int, float]]:
+    """Top ``k`` (course id, fused score) for ``query``, best first."""
+    return await run_in_threadpool(retrieval_index.search, query, k)
+
+
+def stats() -> dict:
+    return retrieval_index.stats()
@@ -0,0 +1,240 @@
+import os
+import re
+from typing import Iterable, Optional
+
+from fastapi import FastAPI
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session, selectinload
+
+from app.config.settings import DbSession, open_db, run_db
+from app.model import model as models
+from app.schema import schema as schemas
+from app.util.log_time import log_time
+
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+REBUILD_BATCH_SIZE = 1000
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Ranking is what a broad term costs: bm25/ts_rank runs on every match. Terms matching more than
+# SEARCH_CANDIDATES courses are ranked among the most recent that many matches (0 ranks them all).
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "2000"))
+# Prefix lengths of the FTS5 index (see the course_search DDL), and how many terms a longer prefix may
+# expand to before it is left to FTS5 as a prefix query
+PREFIX_INDEX_LENGTHS = (2, 3)
+PREFIX_EXPANSIONS = 20
+
+# Rank the candidates first, then build highlights/snippets only for the page that is returned.
+# Column weights: title > tags > learning goals > description
+_SQLITE_SEARCH = text("""
+    WITH candidates AS (
+        SELECT rowid AS id, bm25(course_search, 10.0, 5.0, 2.0, 1.0) AS rank
+        FROM course_search
+        WHERE course_search MATCH :query
+        ORDER BY rowid DESC
+        LIMIT :candidates
+    ),
+    page AS (
+        SELECT id, rank
+        FROM candidates
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.id AS id,
+           courses.title AS title,
+           highlight(course_search, 0, :open, :close) AS title_highlight,
+           snippet(course_search, 3, :open, :close, '…', 16) AS snippet,
+           -page.rank AS score
+    FROM page
+    JOIN course_search ON course_search.rowid = page.id
+    JOIN courses ON courses.id = page.id
+    WHERE course_search MATCH :query
+    ORDER BY page.rank
+""")
+
+_POSTGRES_SEARCH = text("""
+    WITH candidates AS (
+        SELECT course_search.course_id, course_search.document
+        FROM course_search, to_tsquery('simple', :query) AS q
+        WHERE course_search.document @@ q
+        ORDER BY course_search.course_id DESC
+        LIMIT :candidates
+    ),
+    page AS (
+        SELECT candidates.course_id, ts_rank(candidates.document, q) AS score
+        FROM candidates, to_tsquery('simple', :query) AS q
+        ORDER BY score DESC, candidates.course_id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT courses.id AS id,
+           courses.title AS title,
+           ts_headline('simple', courses.title, q, :title_options) AS title_highlight,
+           ts_headline('simple', coalesce(courses.description, ''), q, :snippet_options) AS snippet,
+           page.score AS score
+    FROM page
+    JOIN courses ON courses.id = page.course_id,
+         to_tsquery('simple', :query) AS q
+    ORDER BY page.score DESC, courses.id
+""")
+
+_POSTGRES_UPSERT = text("""
+    INSERT INTO course_search (course_id, document)
+    VALUES (:id,
+            setweight(to_tsvector('simple', :title), 'A') ||
+            setweight(to_tsvector('simple', :tags), 'B') ||
+            setweight(to_tsvector('simple', :learning_goals), 'C') ||
+            setweight(to_tsvector('simple', :description), 'D'))
+    ON CONFLICT (course_id) DO UPDATE SET document = excluded.document
+""")
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def document(course_id: int, title: Optional[str], tags: Optional[Iterable[str]],
+             learning_goals: Optional[Iterable], description: Optional[str]) -> dict:
+    return {
+        "id": course_id,
+        "title": title or "",
+        "tags": " ".join(tags or []),
+        "learning_goals": " ".join(str(g) for g in learning_goals or []),
+        "description": description or "",
+    }
+
+
+def _document(course: models.Course) -> dict:
+    return document(course.id, course.title, [t.tag for t in course.tags or []], course.learning_goals,
+                    course.description)
+
+
+def _write_documents(docs: list[dict], db: Session) -> None:
+    if not docs:
+        return
+    if _dialect(db) == "sqlite":
+        db.execute(text("DELETE FROM course_search WHERE rowid = :id"), [{"id": d["id"]} for d in docs])
+        db.execute(
+            text(
+                "INSERT INTO course_search (rowid, title, tags, learning_goals, description) "
+                "VALUES (:id, :title, :tags, :learning_goals, :description)"
+            ),
+            docs,
+        )
+    else:
+        db.execute(_POSTGRES_UPSERT, docs)
+
+
+def index_course(course: models.Course, db: Session) -> None:
+    """(Re)index one course in the caller's transaction; call after a flush so the id is set."""
+    _write_documents([_document(course)], db)
+
+
+def index_documents(docs: list[dict], db: Session) -> None:
+    """(Re)index many courses from ``document(...)`` dicts in the caller's transaction."""
+    _write_documents(docs, db)
+
+
+def rebuild_search_index(db: Session) -> int:
+    db.execute(text("DELETE FROM course_search"))
+    total, last_id = 0, 0
+    while True:
+        courses = db.scalars(
+            select(models.Course)
+            .options(selectinload(models.Course.tags))
+            .where(models.Course.id > last_id)
+            .order_by(models.Course.id)
+            .limit(REBUILD_BATCH_SIZE)
+        ).all()
+        if not courses:
+            break
+        _write_documents([_document(c) for c in courses], db)
+        total += len(courses)
+        last_id = courses[-1].id
+        db.expunge_all()
+    db.commit()
+    return total
+
+
+def _ensure_search_index(db: Session) -> Optional[int]:
+    indexed = db.execute(text("SELECT count(*) FROM course_search")).scalar_one()
+    courses = db.execute(select(func.count()).select_from(models.Course)).scalar_one()
+    if indexed == courses:
+        return None
+    return rebuild_search_index(db)
+
+
+async def ensure_search_index(app: FastAPI):
+    """Backfill the index on startup when it is out of step with the catalog (new or upgraded database)."""
+    async with open_db(app) as db:
+        rebuilt = await run_db(db, _ensure_search_index)
+    if rebuilt is not None:
+        log_time(f"🔎:       Search index rebuilt ({rebuilt} courses)")
+
+
+def _expand_prefix(token: str, db: Session) -> Optional[list[str]]:
+    """Index terms starting with ``token``, or ``None`` to leave the prefix query to FTS5.
+
+    FTS5 answers a prefix query without a prefix index (longer than PREFIX_INDEX_LENGTHS) by merging
+    the postings of every match up front, so the candidate cap cannot cut it short; an OR of the
+    terms is read lazily like any other query. Non-ASCII tokens are left alone, since the index
+    holds them with diacritics removed.
+    """
+    if len(token) <= max(PREFIX_INDEX_LENGTHS) or not token.isascii():
+        return None
+    terms = db.execute(
+        text("SELECT term FROM course_search_terms WHERE term >= :token AND term < :end LIMIT :limit"),
+        {"token": token, "end": token + "\U0010ffff", "limit": PREFIX_EXPANSIONS + 1},
+    ).scalars().all()
+    return terms if 0 < len(terms) <= PREFIX_EXPANSIONS else None
+
+
+def _match_query(q: str, dialect: str, prefix: bool, db: Optional[Session] = None) -> Optional[str]:
+    tokens = _TOKEN_RE.findall(q.lower())
+    if not tokens:
+        return None
+    if dialect == "sqlite":
+        terms = [f'"{t}"' for t in tokens]
+        if prefix:
+            expanded = _expand_prefix(tokens[-1], db) if db is not None else None
+            terms[-1] = "(" + " OR ".join(f'"{t}"' for t in expanded) + ")" if expanded else terms[-1] + "*"
+        return " AND ".join(terms)
+    terms = list(tokens)
+    if prefix:
+        terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def _search(q: str, limit: int, offset: int, prefix: bool, db: Session) -> list[schemas.CourseSearchHit]:
+    dialect = _dialect(db)
+    query = _match_query(q, dialect, prefix, db)
+    if query is None:
+        return []
+
+    params = {"query": query, "limit": limit, "offset": offset}
+    if dialect == "sqlite":
+        rows = db.execute(_SQLITE_SEARCH, {**params, "candidates": SEARCH_CANDIDATES or -1,
+                                           "open": HIGHLIGHT_OPEN, "close": HIGHLIGHT_CLOSE})
+    else:
+        marks = f"StartSel={HIGHLIGHT_OPEN}, StopSel={HIGHLIGHT_CLOSE}"
+        rows = db.execute(_POSTGRES_SEARCH, {
+            **params,
+            "candidates": SEARCH_CANDIDATES or None,
+            "title_options": f"{marks}, HighlightAll=true",
+            "snippet_options": f"{marks}, MaxWords=24, MinWords=8",
+        })
+    return [
+        schemas.CourseSearchHit(
+            id=r.id,
+            title=r.title,
+            title_highlight=r.title_highlight,
+            snippet=r.snippet or None,
+            score=float(r.score),
+        )
+        for r in rows
+    ]
+
+
+async def search_courses(q: str, db: DbSession, limit: int = 20, offset: int = 0,
+                         prefix: bool = True) -> list[schemas.CourseSearchHit]:
+    return await run_db(db, lambda s: _search(q, limit, offset, prefix, s))
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config.settings import DbSession, run_db
+from app.model import model as models
+from app.schema import schema as schemas
+from app.util.facets import FacetIndex
+
+tag_index = FacetIndex(fields=("format", "course_type", "requires_certificate"), ranges=("rating",))
+
+_version: Optional[tuple] = None  # (course count, max updated_at) the index was last synced to
+_refresh_lock = asyncio.Lock()
+
+
+def _courses_version(db: Session) -> tuple:
+    return tuple(db.execute(select(func.count(models.Course.id), func.max(models.Course.updated_at))).one())
+
+
+def _load_changes(db: Session, since: Optional[datetime]) -> list[tuple[int, list[str], dict]]:
+    courses = select(
+        models.Course.id,
+        models.Course.format,
+        models.Course.course_type,
+        models.Course.requires_certificate,
+        models.Course.rating_avg,
+    )
+    tags = select(models.CourseTag.course_id, models.CourseTag.tag)
+    if since is not None:
+        courses = courses.where(models.Course.updated_at >= since)
+        tags = tags.where(models.CourseTag.course_id.in_(
+            select(models.Course.id).where(models.Course.updated_at >= since)
+        ))
+
+    by_course: dict[int, list[str]] = {}
+    for course_id, tag in db.execute(tags):
+        by_course.setdefault(course_id, []).append(tag)
+    return [
+        (
+            row.id,
+            by_course.get(row.id, []),
+            {
+                "format": row.format,
+                "course_type": row.course_type,
+                "requires_certificate": bool(row.requires_certificate),
+                "rating": row.rating_avg or 0.0,
+            },
+        )
+        for row in db.execute(courses)
+    ]
+
+
+def _sync(db: Session, version: Optional[tuple]):
+    # Read before the changes: rows committed in between are loaded twice at worst, never skipped
+    current = _courses_version(db)
+    newest = current[1]
+    settled = newest is None or newest <= datetime.utcnow() - models.COURSE_LATE_COMMIT
+    if current == version and settled:
+        return current, None, False
+    # Fewer courses than last time means deletions, which the watermark cannot see: reload everything
+    full = version is None or version[1] is None or current[0] < version[0]
+    # Re-read the late-commit window behind the watermark: a write stamped earlier but committed
+    # since then lands there. Upserts are idempotent, so rows seen before only cost the re-read.
+    return current, _load_changes(db, None if full else version[1] - models.COURSE_LATE_COMMIT), full
+
+
+async def refresh_tag_index(db: DbSession):
+    """Bring the index up to date: one aggregate query when nothing changed, else only the changed courses.
+
+    Every worker keeps its own copy; the updated_at watermark also picks up writes made elsewhere.
+    """
+    global _version
+    async with _refresh_lock:
+        version, changes, full = await run_db(db, lambda s: _sync(s, _version))
+        if changes is None:
+            return
+        if full:
+            tag_index.clear()
+        for course_id, tags, attrs in changes:
+            tag_index.upsert(course_id, tags, attrs)
+        _version = version
+
+
+async def tag_facets(db: DbSession, *, format: Optional[str] = None, course_type: Optional[str] = None,
+                     tag: Optional[str] = None, requires_certificate: Optional[bool] = None,
+                     min_rating: Optional[float] = None, limit: Optional[int] = None) -> schemas.TagFacetsOut:
+    await refresh_tag_index(db)
+
+    equals = {
+        field: wanted
+        for field, wanted in (("format", format), ("course_type", course_type),
+                              ("requires_certificate", requires_certificate))
+        if wanted is not None
+    }
+    at_least = {"rating": min_rating} if min_rating is not None else None
+    filtered = bool(tag or equals or at_least)
+    within = tag_index.select(tag.strip() if tag else None, equals, at_least) if filtered else None
+    counts = sorted(tag_index.counts(within).items(), key=lambda kv: (-kv[1], kv[0]))
+    if limit is not None:
+        counts = counts[:limit]
+    return schemas.TagFacetsOut(
+        total=len(within) if within is not None else len(tag_index),
+        tags=[schemas.TagFacet(tag=t, count=n) for t, n in counts],
+    )
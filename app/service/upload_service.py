@@ -0,0 +1,204 @@
+import shutil
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config.settings import DbSession, run_db
+from app.model import model as models
+from app.schema import schema as schemas
+from app.service import course_service
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+def _session_dir(course_id: int, upload_id: str) -> Path:
+    return course_service.UPLOAD_ROOT / str(course_id) / ".sessions" / upload_id
+
+
+def _part_path(course_id: int, upload_id: str, part_number: int) -> Path:
+    return _session_dir(course_id, upload_id) / f"{part_number}.part"
+
+
+def _to_out(session: models.UploadSession) -> schemas.UploadSessionOut:
+    parts = [
+        schemas.UploadPartOut(
+            part_number=p.part_number,
+            offset=(p.part_number - 1) * session.part_size,
+            size=p.size,
+            sha256=p.sha256,
+        )
+        for p in session.parts
+    ]
+    return schemas.UploadSessionOut(
+        id=session.id,
+        course_id=session.course_id,
+        file_name=session.file_name,
+        part_size=session.part_size,
+        total_size=session.total_size,
+        status=session.status,
+        received_bytes=sum(p.size for p in parts),
+        parts=parts,
+    )
+
+
+def _get_session(course_id: int, upload_id: str, db: Session) -> models.UploadSession:
+    session = db.get(models.UploadSession, upload_id)
+    if not session or session.course_id != course_id:
+        raise HTTPException(status_code=404, detail="Sesión de carga no encontrada")
+    return session
+
+
+def _get_open_session(course_id: int, upload_id: str, db: Session) -> models.UploadSession:
+    session = _get_session(course_id, upload_id, db)
+    if session.status != "open":
+        raise HTTPException(status_code=409, detail="La sesión de carga ya fue completada")
+    return session
+
+
+# --------- services ---------
+
+def create_session(course_id: int, payload: schemas.UploadSessionCreate, db: Session) -> schemas.UploadSessionOut:
+    course = course_service.get_course(course_id, db)
+    if payload.total_size and payload.total_size > course_service.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+
+    session = models.UploadSession(
+        id=str(uuid4()),
+        course_id=course.id,
+        file_name=payload.file_name,
+        part_size=payload.part_size or DEFAULT_PART_SIZE,
+        total_size=payload.total_size,
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return _to_out(session)
+
+
+def get_session(course_id: int, upload_id: str, db: Session) -> schemas.UploadSessionOut:
+    return _to_out(_get_session(course_id, upload_id, db))
+
+
+async def _write_part(chunks: AsyncIterator[bytes], part_dir: Path, part_path: Path, max_size: int) -> tuple[str, int]:
+    return await course_service.write_stream(
+        chunks, part_dir, part_path, max_size, "La parte excede el tamaño de parte de la sesión"
+    )
+
+
+def _stored_bytes(upload_id: str, part_number: int, db: Session) -> int:
+    """Bytes held by the session's other parts; a re-sent part replaces its previous size."""
+    return db.execute(
+        select(func.coalesce(func.sum(models.UploadPart.size), 0))
+        .where(models.UploadPart.upload_id == upload_id, models.UploadPart.part_number != part_number)
+    ).scalar_one()
+
+
+def _open_part(course_id: int, upload_id: str, part_number: int, db: Session) -> tuple[int, Optional[int], int]:
+    session = _get_open_session(course_id, upload_id, db)
+    return session.part_size, session.total_size, _stored_bytes(upload_id, part_number, db)
+
+
+def _record_part(upload_id: str, part_number: int, size: int, sha256: str, db: Session) -> None:
+    # Parts of one session may arrive in parallel, each within the budget it saw before writing
+    if _stored_bytes(upload_id, part_number, db) + size > course_service.MAX_UPLOAD_BYTES:
+        # The rejected body already replaced the part's file, so an earlier copy of the part goes too
+        db.execute(delete(models.UploadPart).where(models.UploadPart.upload_id == upload_id,
+                                                   models.UploadPart.part_number == part_number))
+        db.commit()
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+    db.merge(models.UploadPart(upload_id=upload_id, part_number=part_number, size=size, sha256=sha256))
+    db.commit()
+
+
+async def upload_part(course_id: int, upload_id: str, part_number: int, chunks: AsyncIterator[bytes],
+                      db: DbSession) -> schemas.UploadPartOut:
+    part_size, total_size, stored = await run_db(
+        db, lambda s: _open_part(course_id, upload_id, part_number, s)
+    )
+
+    if total_size and (part_number - 1) * part_size >= total_size:
+        raise HTTPException(status_code=422, detail="Número de parte fuera del tamaño declarado")
+    # Without total_size nothing else bounds the session: its parts together stay under the upload limit
+    remaining = course_service.MAX_UPLOAD_BYTES - stored
+    if (part_number - 1) * part_size >= course_service.MAX_UPLOAD_BYTES or remaining <= 0:
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+
+    # Re-sending a part overwrites it, so a client can simply retry whatever did not get acknowledged
+    part_path = _part_path(course_id, upload_id, part_number)
+    if remaining < part_size:
+        sha256, size = await course_service.write_stream(
+            chunks, _session_dir(course_id, upload_id), part_path, remaining, "Archivo demasiado grande"
+        )
+    else:
+        sha256, size = await _write_part(chunks, _session_dir(course_id, upload_id), part_path, part_size)
+    if size == 0:
+        raise HTTPException(status_code=422, detail="La parte está vacía")
+
+    try:
+        await run_db(db, lambda s: _record_part(upload_id, part_number, size, sha256, s))
+    except HTTPException:
+        await run_in_threadpool(part_path.unlink, True)
+        raise
+    return schemas.UploadPartOut(part_number=part_number, offset=(part_number - 1) * part_size, size=size,
+                                 sha256=sha256)
+
+
+def _check_complete(course_id: int, upload_id: str, db: Session) -> tuple[str, list[int]]:
+    session = _get_open_session(course_id, upload_id, db)
+    parts = session.parts
+    if not parts:
+        raise HTTPException(status_code=422, detail="No se recibió ninguna parte")
+
+    numbers = [p.part_number for p in parts]
+    if numbers != list(range(1, len(parts) + 1)):
+        missing = sorted(set(range(1, numbers[-1] + 1)) - set(numbers))
+        raise HTTPException(status_code=422, detail=f"Faltan partes: {missing}")
+    if any(p.size != session.part_size for p in parts[:-1]):
+        raise HTTPException(status_code=422, detail="Solo la última parte puede ser más pequeña que part_size")
+    if session.total_size and sum(p.size for p in parts) != session.total_size:
+        raise HTTPException(status_code=422, detail="El tamaño recibido no coincide con total_size")
+    return session.file_name, numbers
+
+
+def _read_parts(paths: list[Path]) -> Iterator[bytes]:
+    for path in paths:
+        with open(path, "rb") as f:
+            yield from course_service.read_chunks(f)
+
+
+def _finish_session(course_id: int, upload_id: str, file_path: Path, sha256: str, size: int,
+                    db: Session) -> models.Course:
+    session = _get_open_session(course_id, upload_id, db)
+    session.status = "completed"
+    session.parts.clear()
+    return course_service.attach_course_file(course_id, file_path, sha256, size, db)
+
+
+async def complete_session(course_id: int, upload_id: str, db: DbSession) -> models.Course:
+    file_name, numbers = await run_db(db, lambda s: _check_complete(course_id, upload_id, s))
+
+    # Parts are streamed into the final file chunk by chunk, never held in memory as a whole
+    paths = [_part_path(course_id, upload_id, n) for n in numbers]
+    file_path, sha256, size = await run_in_threadpool(
+        course_service.store_course_file, _read_parts(paths), course_id, course_service.course_file_name(file_name)
+    )
+    course = await run_db(db, lambda s: _finish_session(course_id, upload_id, file_path, sha256, size, s))
+    await course_service.invalidate_course(course_id)
+    await run_in_threadpool(shutil.rmtree, _session_dir(course_id, upload_id), True)
+    return course
+
+
+def _delete_session(course_id: int, upload_id: str, db: Session) -> None:
+    session = _get_open_session(course_id, upload_id, db)
+    db.delete(session)
+    db.commit()
+
+
+async def abort_session(course_id: int, upload_id: str, db: DbSession) -> None:
+    await run_db(db, lambda s: _delete_session(course_id, upload_id, s))
+    await run_in_threadpool(shutil.rmtree, _session_dir(course_id, upload_id), True)
@@ -1,11 +1,25 @@
+import os
+from datetime import datetime
+from typing import Optional
+
 from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from starlette import status
 
+from app.config.settings import DbSession, run_db, cache_backend
 from app.model import model as models
 from app.schema import schema as schemas
-from app.util.security import hash_password
+from app.util.cache import Cache
+from app.util.conditional import weak_etag
+from app.util.security import hash_password, hash_password_async
+
+profile_cache = Cache(
+    cache_backend,
+    "user_profile",
+    schemas.UserProfileResponse,
+    ttl=float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300")),
+)
 
 
 def _to_profile_response(user: models.User) -> schemas.UserProfileResponse:
@@ -36,11 +50,12 @@ def _to_profile_response(user: models.User) -> schemas.UserProfileResponse:
     return schemas.UserProfileResponse.model_validate(profile_data, from_attributes=True)
 
 
-def create_user(user_in: schemas.UserCreate, db: Session) -> schemas.UserProfileResponse:
+def _insert_user(user_in: schemas.UserCreate, db: Session,
+                 password_hash: str | None = None) -> schemas.UserProfileResponse:
     new_user = models.User(
         name=user_in.name.strip(),
         email=user_in.email.strip().lower(),
-        password=hash_password(user_in.password),
+        password=password_hash or hash_password(user_in.password),
         phone=(user_in.phone.strip() if user_in.phone else None),
         website=(user_in.website.strip() if user_in.website else None),
         bio=(user_in.bio.strip() if user_in.bio else None),
@@ -58,7 +73,8 @@ def create_user(user_in: schemas.UserCreate, db: Session) -> schemas.UserProfile
     return _to_profile_response(new_user)
 
 
-def edit_user(user_id: int, user_in: schemas.UserUpdate, db: Session) -> schemas.UserProfileResponse:
+def _update_user(user_id: int, user_in: schemas.UserUpdate, db: Session,
+                 password_hash: str | None = None) -> schemas.UserProfileResponse:
     user: models.User | None = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
@@ -73,7 +89,7 @@ def edit_user(user_id: int, user_in: schemas.UserUpdate, db: Session) -> schemas
 
     # Password
     if user_in.password is not None and user_in.password != "":
-        user.password = hash_password(user_in.password)
+        user.password = password_hash or hash_password(user_in.password)
 
     # Optionals
     if user_in.phone is not None:
@@ -101,8 +117,51 @@ def edit_user(user_id: int, user_in: schemas.UserUpdate, db: Session) -> schemas
     return _to_profile_response(user)
 
 
-def get_user(user_id: int, db: Session) -> schemas.UserProfileResponse | None:
-    user = db.get(models.User, user_id)
-    if not user:
-        return None
-    return _to_profile_response(user)
+def _load_profiles(user_ids: list[int], db: Session) -> dict[int, schemas.UserProfileResponse]:
+    users = db.query(models.User).filter(models.User.id.in_(user_ids)).all()
+    return {user.id: _to_profile_response(user) for user in users}
+
+
+# --------- services ---------
+
+async def create_user(user_in: schemas.UserCreate, db: DbSession) -> schemas.UserProfileResponse:
+    password_hash = await hash_password_async(user_in.password)
+    profile = await run_db(db, lambda s: _insert_user(user_in, s, password_hash=password_hash))
+    await profile_cache.set_many({profile.id: profile})
+    return profile
+
+
+async def edit_user(user_id: int, user_in: schemas.UserUpdate, db: DbSession) -> schemas.UserProfileResponse:
+    password_hash = await hash_password_async(user_in.password) if user_in.password else None
+    profile = await run_db(db, lambda s: _update_user(user_id, user_in, s, password_hash=password_hash))
+    await profile_cache.set_many({profile.id: profile})
+    return profile
+
+
+async def get_user(user_id: int, db: DbSession, version: Optional[datetime] = None) -> schemas.UserProfileResponse | None:
+    """Profile through the cache; with ``version`` (the row's updated_at), an older cached profile is reloaded.
+
+    That keeps a cache that missed an invalidation (another worker, a direct DB write) from serving
+    a body older than the ETag computed from ``version``.
+    """
+    def load(ids):
+        return run_db(db, lambda s: _load_profiles(ids, s))
+
+    profiles = await profile_cache.get_or_load([user_id], load)
+    profile = profiles.get(user_id)
+    if version is not None and profile is not None and profile.updated_at != version:
+        fresh = await load([user_id])
+        await profile_cache.set_many(fresh)
+        profile = fresh.get(user_id)
+    return profile
+
+
+async def get_profile_version(user_id: int, db: DbSession) -> Optional[datetime]:
+    """The profile's updated_at, or ``None`` if the user does not exist."""
+    return await run_db(
+        db, lambda s: s.query(models.User.updated_at).filter(models.User.id == user_id).scalar()
+    )
+
+
+def profile_etag(user_id: int, updated_at: datetime) -> str:
+    return weak_etag("user", user_id, updated_at)
@@ -1,62 +1,158 @@
+from typing import Optional
 from uuid import uuid4
 
 from fastapi import HTTPException
+from sqlalchemy import and_, delete, literal, or_, select
 from sqlalchemy.orm import Session
 
 from app.model import model as models
-from app.model.model import Watchlist
 from app.schema import schema as schemas
+from app.service.course_service import format_duration
+from app.util.sql import dialect_insert, has_upsert, upsert
 
 
-def get_watchlist(db: Session, user_id: str) -> list[type[Watchlist]]:
-    return (
-        db.query(models.Watchlist)
-        .filter(models.Watchlist.user_id == user_id)
-        .order_by(models.Watchlist.created_at.desc())
-        .all()
-    )
+def _page(query, user_id: int, cursor: Optional[str], limit: Optional[int]):
+    """Newest first, keyset on (created_at, id) using the user's index."""
+    W = models.Watchlist
+    query = query.where(W.user_id == user_id)
+    if cursor is not None:
+        anchor = select(W.created_at).where(W.id == cursor, W.user_id == user_id).scalar_subquery()
+        query = query.where(or_(W.created_at < anchor, and_(W.created_at == anchor, W.id < cursor)))
+    query = query.order_by(W.created_at.desc(), W.id.desc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
 
 
-def add_to_watchlist(payload: schemas.WatchlistCreate, db: Session) -> models.Watchlist:
-    # Verify course exists
-    course = db.get(models.Course, payload.course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Curso no encontrado")
+def _split_page(rows: list, limit: Optional[int]) -> tuple[list, Optional[str]]:
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
 
-    # Prevent duplicates
-    existing = (
-        db.query(models.Watchlist)
-        .filter(
-            models.Watchlist.user_id == payload.user_id,
-            models.Watchlist.course_id == payload.course_id,
+def get_watchlist(db: Session, user_id: int, cursor: Optional[str] = None,
+                  limit: Optional[int] = None) -> tuple[list[schemas.WatchlistOut], Optional[str]]:
+    W = models.Watchlist
+    rows = db.execute(_page(select(W.id, W.course_id, W.user_id, W.created_at), user_id, cursor, limit)).all()
+    rows, next_cursor = _split_page(rows, limit)
+    return [schemas.WatchlistOut.model_validate(r) for r in rows], next_cursor
+
+
+def get_watchlist_entries(db: Session, user_id: int, cursor: Optional[str] = None,
+                          limit: Optional[int] = None) -> tuple[list[schemas.WatchlistEntryOut], Optional[str]]:
+    """Watchlist joined with course summaries and the user's progress in one query."""
+    W, C, P = models.Watchlist, models.Course, models.CourseProgress
+    query = (
+        select(
+            W.id, W.course_id, W.user_id, W.created_at,
+            C.title, C.duration_seconds, C.format, C.course_type, C.rating_avg, C.thumbnail_url,
+            C.requires_certificate, P.progress, P.is_downloaded,
         )
-        .first()
+        .join(C, C.id == W.course_id)
+        .outerjoin(P, and_(P.course_id == W.course_id, P.user_id == W.user_id))
     )
-    if existing:
-        raise HTTPException(status_code=400, detail="Curso ya está en la lista")
+    rows, next_cursor = _split_page(db.execute(_page(query, user_id, cursor, limit)).all(), limit)
+    return [
+        schemas.WatchlistEntryOut(
+            id=r.id,
+            course_id=r.course_id,
+            user_id=r.user_id,
+            created_at=r.created_at,
+            course=schemas.WatchlistCourseOut(
+                id=r.course_id,
+                title=r.title,
+                duration=format_duration(r.duration_seconds),
+                format=r.format,
+                course_type=r.course_type,
+                rating=round(r.rating_avg or 0.0, 2),
+                thumbnail_url=r.thumbnail_url,
+                requires_certificate=bool(r.requires_certificate),
+            ),
+            progress=r.progress or 0,
+            is_downloaded=bool(r.is_downloaded),
+        )
+        for r in rows
+    ], next_cursor
 
-    item = models.Watchlist(
-        id=str(uuid4()),
-        user_id=payload.user_id,
-        course_id=payload.course_id,
-    )
-    db.add(item)
+
+def _not_added(payload: schemas.WatchlistCreate, db: Session):
+    # Only reached when nothing was inserted: tell a missing course apart from a duplicate
+    if db.get(models.Course, payload.course_id) is None:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    raise HTTPException(status_code=400, detail="Curso ya está en la lista")
+
+
+def add_to_watchlist(payload: schemas.WatchlistCreate, db: Session):
+    """Insert-or-ignore in one statement; the unique (user_id, course_id) index settles concurrent adds.
+
+    Databases without ``ON CONFLICT`` check the course first and go through ``upsert``'s generic path.
+    """
+    table = models.Watchlist.__table__
+    if has_upsert(db):
+        course_exists = select(models.Course.id).where(models.Course.id == payload.course_id).exists()
+        new_row = select(literal(str(uuid4())), literal(payload.user_id), literal(payload.course_id))
+        stmt = (
+            dialect_insert(db, table)
+            .from_select(["id", "user_id", "course_id"], new_row.where(course_exists))
+            .on_conflict_do_nothing(index_elements=["user_id", "course_id"])
+            .returning(*table.c)
+        )
+        item = db.execute(stmt).one_or_none()
+    elif db.get(models.Course, payload.course_id) is None:
+        item = None
+    else:
+        row = {"id": str(uuid4()), "user_id": payload.user_id, "course_id": payload.course_id}
+        item = next(iter(upsert(db, table, [row], ["user_id", "course_id"], returning=table.c)), None)
+    if item is None:
+        db.rollback()
+        _not_added(payload, db)
     db.commit()
-    db.refresh(item)
     return item
 
 
-def remove_from_watchlist(user_id: str, course_id: str, db: Session) -> None:
-    record = (
-        db.query(models.Watchlist)
-        .filter(
-            models.Watchlist.user_id == user_id,
-            models.Watchlist.course_id == course_id,
-        )
-        .first()
-    )
-    if not record:
+def remove_from_watchlist(user_id: int, course_id: int, db: Session) -> None:
+    stmt = delete(models.Watchlist).where(models.Watchlist.user_id == user_id, models.Watchlist.course_id == course_id)
+    if db.execute(stmt).rowcount == 0:
+        db.rollback()
         raise HTTPException(status_code=404, detail="No encontrado en la lista")
+    db.commit()
+
+
+def bulk_update_watchlist(payload: schemas.WatchlistBulkIn, db: Session) -> schemas.WatchlistBulkOut:
+    """Apply additions, then removals, in a single transaction."""
+    table = models.Watchlist.__table__
+    add = list(dict.fromkeys(payload.add))
+    remove = list(dict.fromkeys(payload.remove))
+    added, already_present, removed, not_found, unknown = [], [], [], [], []
+
+    if add:
+        known = set(db.scalars(select(models.Course.id).where(models.Course.id.in_(add))))
+        unknown = [c for c in add if c not in known]
+        to_add = [c for c in add if c in known]
+        if to_add:
+            rows = [{"id": str(uuid4()), "user_id": payload.user_id, "course_id": c} for c in to_add]
+            inserted = {r.course_id for r in upsert(db, table, rows, ["user_id", "course_id"],
+                                                    returning=[table.c.course_id])}
+            added = [c for c in to_add if c in inserted]
+            already_present = [c for c in to_add if c not in inserted]
+
+    if remove:
+        matching = (models.Watchlist.user_id == payload.user_id, models.Watchlist.course_id.in_(remove))
+        if db.get_bind().dialect.delete_returning:
+            deleted = set(db.scalars(delete(models.Watchlist).where(*matching).returning(models.Watchlist.course_id)))
+        else:
+            # No DELETE ... RETURNING (MySQL): find the rows first, under a lock where the database has one
+            deleted = set(db.scalars(select(models.Watchlist.course_id).where(*matching).with_for_update()))
+            db.execute(delete(models.Watchlist).where(*matching))
+        removed = [c for c in remove if c in deleted]
+        not_found = [c for c in remove if c not in deleted]
 
-    db.delete(record)
     db.commit()
+    return schemas.WatchlistBulkOut(
+        added=added,
+        already_present=already_present,
+        removed=removed,
+        not_found=not_found,
+        unknown_course_ids=unknown,
+    )
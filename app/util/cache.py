@@ -0,0 +1,343 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Generic, Hashable, Iterable, TypeVar
+
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key: Hashable, now: float):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def _store(self, key: Hashable, value: Any, expires_at: float):
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+        return value if found else default
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict:
+        """Return the cached subset of ``keys``; missing or expired keys are left out."""
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for key in keys:
+                found, value = self._lookup(key, now)
+                if found:
+                    result[key] = value
+        return result
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        with self._lock:
+            self._store(key, value, time.monotonic() + (self.ttl if ttl is None else ttl))
+
+    def set_many(self, items: dict, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for key, value in items.items():
+                self._store(key, value, expires_at)
+
+    def delete(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# -------------------------------------------- BACKENDS --------------------------------------------
+class MemoryCacheBackend:
+    """Per-process backend; values are kept as Python objects, so nothing is serialized."""
+
+    serializes = False
+
+    def __init__(self, maxsize: int = 10000):
+        self._lru = LRUCache(maxsize=maxsize)
+        self._counters: dict[str, int] = {}
+        self._counter_lock = threading.Lock()
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        return self._lru.get_many(keys)
+
+    async def set_many(self, items: dict[str, Any], ttl: float):
+        self._lru.set_many(items, ttl)
+
+    async def delete(self, *keys: str):
+        self._lru.delete(*keys)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        with self._counter_lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    async def acquire_locks(self, keys: list[str], ttl: float) -> set[str]:
+        # One process: concurrent loads are already coalesced by Cache itself
+        return set(keys)
+
+    async def release_locks(self, keys: list[str]):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self._lru.stats()}
+
+
+class RedisCacheBackend:
+    """Shared backend speaking the Redis protocol (Redis, Valkey, KeyDB, a local fake...)."""
+
+    serializes = True
+
+    def __init__(self, url: str = None, client=None):
+        if client is None:
+            import redis.asyncio as redis  # only needed when a Redis URL is configured
+            client = redis.from_url(url)
+        self._client = client
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        if not keys:
+            return {}
+        values = await self._client.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, items: dict[str, Any], ttl: float):
+        if not items:
+            return
+        pipe = self._client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, value, px=int(ttl * 1000))
+        await pipe.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*keys)
+
+    async def get_counter(self, key: str) -> int:
+        value = await self._client.get(key)
+        return int(value) if value is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+    async def acquire_locks(self, keys: list[str], ttl: float) -> set[str]:
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(key, b"1", nx=True, px=int(ttl * 1000))
+        acquired = await pipe.execute()
+        return {key for key, ok in zip(keys, acquired) if ok}
+
+    async def release_locks(self, keys: list[str]):
+        await self.delete(*keys)
+
+    async def close(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+def create_cache_backend(url: str | None, maxsize: int = 10000):
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url)
+    return MemoryCacheBackend(maxsize=maxsize)
+
+
+# -------------------------------------------- NAMESPACED CACHE --------------------------------------------
+class Cache(Generic[M]):
+    """Typed, namespaced view over a backend.
+
+    Keys carry a schema version and a namespace generation, so ``invalidate_all`` is a
+    single counter bump and a deploy that changes the DTO shape never reads old entries.
+    ``get_or_load`` coalesces concurrent misses (single flight): in-process through shared
+    futures, across workers through short-lived per-key locks on the backend.
+    """
+
+    GENERATION_REFRESH_SECONDS = 1.0
+    LOCK_TTL_SECONDS = 5.0
+    LOCK_WAIT_SECONDS = 1.0
+    LOCK_POLL_SECONDS = 0.05
+
+    def __init__(self, backend, namespace: str, model: type[M], ttl: float, version: str = "v1"):
+        self.backend = backend
+        self.namespace = namespace
+        self.model = model
+        self.ttl = ttl
+        self.version = version
+        self._generation = 0
+        self._generation_checked = float("-inf")
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0
+
+    @property
+    def _generation_key(self) -> str:
+        return f"{self.version}:{self.namespace}:generation"
+
+    async def _current_generation(self) -> int:
+        now = time.monotonic()
+        if now - self._generation_checked > self.GENERATION_REFRESH_SECONDS:
+            self._generation = await self.backend.get_counter(self._generation_key)
+            self._generation_checked = now
+        return self._generation
+
+    def _key(self, generation: int, item_id: Hashable) -> str:
+        return f"{self.version}:{self.namespace}:g{generation}:{item_id}"
+
+    def _dumps(self, value: M):
+        return value.model_dump_json() if self.backend.serializes else value
+
+    def _loads(self, raw) -> M:
+        return self.model.model_validate_json(raw) if self.backend.serializes else raw
+
+    async def get_many(self, ids: Iterable[Hashable]) -> dict[Hashable, M]:
+        ids = list(ids)
+        generation = await self._current_generation()
+        raw = await self.backend.get_many([self._key(generation, i) for i in ids])
+        found = {}
+        for item_id in ids:
+            value = raw.get(self._key(generation, item_id))
+            if value is not None:
+                found[item_id] = self._loads(value)
+        self.hits += len(found)
+        self.misses += len(ids) - len(found)
+        return found
+
+    async def set_many(self, items: dict[Hashable, M]):
+        generation = await self._current_generation()
+        await self.backend.set_many(
+            {self._key(generation, item_id): self._dumps(value) for item_id, value in items.items()}, self.ttl
+        )
+
+    async def invalidate(self, *ids: Hashable):
+        generation = await self._current_generation()
+        await self.backend.delete(*(self._key(generation, i) for i in ids))
+
+    async def invalidate_all(self):
+        self._generation = await self.backend.incr(self._generation_key)
+        self._generation_checked = time.monotonic()
+
+    async def _load_shared(self, ids: list[Hashable], loader: Callable[[list], Awaitable[dict]]) -> dict:
+        generation = await self._current_generation()
+        lock_keys = {i: f"{self._key(generation, i)}:lock" for i in ids}
+        acquired = await self.backend.acquire_locks(list(lock_keys.values()), self.LOCK_TTL_SECONDS)
+        mine = [i for i in ids if lock_keys[i] in acquired]
+        theirs = [i for i in ids if lock_keys[i] not in acquired]
+        result = {}
+        try:
+            if mine:
+                loaded = await loader(mine)
+                self.loads += 1
+                await self.set_many(loaded)
+                result.update(loaded)
+        finally:
+            await self.backend.release_locks([lock_keys[i] for i in mine])
+
+        # Another worker is already recomputing these: give it a moment, then load what is still missing
+        deadline = time.monotonic() + self.LOCK_WAIT_SECONDS
+        while theirs and time.monotonic() < deadline:
+            await asyncio.sleep(self.LOCK_POLL_SECONDS)
+            found = await self.get_many(theirs)
+            result.update(found)
+            theirs = [i for i in theirs if i not in found]
+        if theirs:
+            loaded = await loader(theirs)
+            self.loads += 1
+            await self.set_many(loaded)
+            result.update(loaded)
+        return result
+
+    async def get_or_load(self, ids: Iterable[Hashable], loader: Callable[[list], Awaitable[dict]]) -> dict[Hashable, M]:
+        """Cached values for ``ids``; misses are loaded through ``loader(missing_ids) -> {id: value}``."""
+        ids = list(dict.fromkeys(ids))
+        result = await self.get_many(ids)
+        missing = [i for i in ids if i not in result]
+        if not missing:
+            return result
+
+        waiting = {i: self._inflight[i] for i in missing if i in self._inflight}
+        to_load = [i for i in missing if i not in waiting]
+        self.coalesced += len(waiting)
+
+        if to_load:
+            future = asyncio.get_running_loop().create_future()
+            for item_id in to_load:
+                self._inflight[item_id] = future
+            try:
+                loaded = await self._load_shared(to_load, loader)
+                future.set_result(loaded)
+            except BaseException as exc:
+                future.set_exception(exc)
+                future.exception()  # waiters re-raise it; avoid "never retrieved" when there are none
+                raise
+            finally:
+                for item_id in to_load:
+                    self._inflight.pop(item_id, None)
+            result.update(loaded)
+
+        for item_id, future in waiting.items():
+            loaded = await asyncio.shield(future)
+            if item_id in loaded:
+                result[item_id] = loaded[item_id]
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+        }
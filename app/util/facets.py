@@ -0,0 +1,93 @@
+from bisect import bisect_left, insort
+from typing import Any, Hashable, Iterable, Optional
+
+
+class FacetIndex:
+    """In-memory inverted index: facet value -> set of item ids, plus per-item attributes.
+
+    Counts for a filtered subset are set intersections, so faceted browsing never scans
+    the join table. ``upsert`` replaces an item's values, which keeps updates incremental.
+
+    Attributes named in ``fields`` get their own postings (attribute value -> ids) for equality
+    filters; those in ``ranges`` are kept sorted for ``>=`` filters. Either way a filter is
+    answered from prebuilt sets, never by looking at every item.
+    """
+
+    def __init__(self, fields: Iterable[str] = (), ranges: Iterable[str] = ()):
+        self._values: dict[Hashable, set[int]] = {}
+        self._items: dict[int, tuple[frozenset, dict[str, Any]]] = {}
+        self._fields: dict[str, dict[Hashable, set[int]]] = {f: {} for f in fields}
+        self._ranges: dict[str, list[tuple[Any, int]]] = {r: [] for r in ranges}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def _discard(postings: dict[Hashable, set[int]], value: Hashable, item_id: int):
+        ids = postings.get(value)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del postings[value]
+
+    def upsert(self, item_id: int, values: Iterable[Hashable], attrs: dict[str, Any]):
+        values = frozenset(values)
+        previous = self._items.get(item_id)
+        old_values, old_attrs = previous if previous is not None else (frozenset(), None)
+        for value in old_values - values:
+            self._discard(self._values, value, item_id)
+        for value in values:
+            self._values.setdefault(value, set()).add(item_id)
+
+        for field, postings in self._fields.items():
+            if old_attrs is not None:
+                self._discard(postings, old_attrs[field], item_id)
+            postings.setdefault(attrs[field], set()).add(item_id)
+        for field, ordered in self._ranges.items():
+            if old_attrs is not None:
+                del ordered[bisect_left(ordered, (old_attrs[field], item_id))]
+            insort(ordered, (attrs[field], item_id))
+        self._items[item_id] = (values, attrs)
+
+    def clear(self):
+        self._values.clear()
+        self._items.clear()
+        for postings in self._fields.values():
+            postings.clear()
+        for ordered in self._ranges.values():
+            ordered.clear()
+
+    def select(self, value: Optional[Hashable] = None, equals: Optional[dict[str, Hashable]] = None,
+               at_least: Optional[dict[str, Any]] = None) -> set[int]:
+        """Ids carrying ``value`` (any when ``None``) with ``attr == equals[attr]`` and ``attr >= at_least[attr]``."""
+        sets = []
+        if value is not None:
+            sets.append(self._values.get(value, set()))
+        for field, wanted in (equals or {}).items():
+            sets.append(self._fields[field].get(wanted, set()))
+        for field, low in (at_least or {}).items():
+            ordered = self._ranges[field]
+            sets.append({item_id for _, item_id in ordered[bisect_left(ordered, (low, float("-inf"))):]})
+        if not sets:
+            return set(self._items)
+        # Smallest first, so every intersection is at most as large as the result so far
+        sets.sort(key=len)
+        ids = set(sets[0])
+        for other in sets[1:]:
+            ids &= other
+            if not ids:
+                break
+        return ids
+
+    def counts(self, within: Optional[set[int]] = None) -> dict[Hashable, int]:
+        if within is None:
+            return {value: len(ids) for value, ids in self._values.items()}
+        counts = {}
+        for value, ids in self._values.items():
+            n = len(ids & within)
+            if n:
+                counts[value] = n
+        return counts
+
+    def stats(self) -> dict:
+        return {"items": len(self._items), "values": len(self._values)}
@@ -0,0 +1,98 @@
+from collections import deque
+from typing import AsyncIterator, Optional
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartError(ValueError):
+    pass
+
+
+class MultipartFile:
+    """One file field of a ``multipart/form-data`` body, parsed while the body streams in.
+
+    Unlike ``UploadFile``, nothing is spooled: ``open()`` reads up to the part headers of
+    ``field`` and ``read()`` yields its data as it arrives, so the caller can write it
+    straight to its destination and stop at any size limit.
+    """
+
+    def __init__(self, content_type: Optional[str], chunks: AsyncIterator[bytes], field: str):
+        _, params = parse_options_header(content_type or "")
+        if not (content_type or "").lower().startswith("multipart/form-data") or b"boundary" not in params:
+            raise MultipartError("Se esperaba multipart/form-data")
+        self.field = field
+        self.filename: Optional[str] = None
+        self._chunks = chunks.__aiter__()
+        self._events: deque = deque()
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    # Parser callbacks only queue events; the async side consumes them
+    def _on_part_begin(self):
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name, filename = options.get(b"name"), options.get(b"filename")
+        self._events.append((
+            "part",
+            name.decode("utf-8", "replace") if name is not None else None,
+            filename.decode("utf-8", "replace") if filename is not None else None,
+        ))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._events.append(("data", bytes(data[start:end])))
+
+    def _on_part_end(self):
+        self._events.append(("end",))
+
+    async def _next_event(self) -> Optional[tuple]:
+        while not self._events:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return None
+            try:
+                self._parser.write(chunk)
+            except MultipartParseError as exc:
+                raise MultipartError(f"Cuerpo multipart inválido: {exc}") from exc
+        return self._events.popleft()
+
+    async def open(self) -> str:
+        """Skip to the file part named ``field``; returns its file name."""
+        while (event := await self._next_event()) is not None:
+            if event[0] == "part" and event[1] == self.field and event[2] is not None:
+                self.filename = event[2]
+                return self.filename
+        raise MultipartError(f"Falta el archivo '{self.field}'")
+
+    async def read(self) -> AsyncIterator[bytes]:
+        """Data of the part found by ``open()``, chunk by chunk."""
+        while (event := await self._next_event()) is not None:
+            if event[0] == "end":
+                return
+            if event[0] == "data" and event[1]:
+                yield event[1]
+        raise MultipartError("Cuerpo multipart incompleto")
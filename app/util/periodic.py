@@ -0,0 +1,52 @@
+import asyncio
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional
+
+from app.util.log_time import log_time
+
+
+class PeriodicJob:
+    """Runs ``job`` every ``interval`` seconds in the background, after ``first`` (if given) right at start.
+
+    A failed run is logged as ``failure`` and retried at the next interval. Runs are shielded from
+    ``stop``: cancelling one inside ``run_db`` would close its session while the worker thread is
+    still using it (with the sync engine), so ``stop`` ends the wait between runs and lets a run
+    in progress finish.
+    """
+
+    def __init__(self, job: Callable[[], Awaitable], interval: float, failure: str,
+                 first: Optional[Callable[[], Awaitable]] = None):
+        self.job = job
+        self.interval = interval
+        self.failure = failure
+        self.first = first
+        self._task: asyncio.Task | None = None
+        self._inflight: asyncio.Future | None = None
+
+    async def _step(self, job: Callable[[], Awaitable]):
+        self._inflight = asyncio.ensure_future(job())
+        try:
+            await asyncio.shield(self._inflight)
+        except Exception as exc:
+            log_time(f"⚠️:       {self.failure}: {exc!r}")
+
+    async def _run(self):
+        if self.first is not None:
+            await self._step(self.first)
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._step(self.job)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._inflight is not None:
+            await asyncio.gather(self._inflight, return_exceptions=True)
+            self._inflight = None
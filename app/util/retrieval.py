@@ -0,0 +1,377 @@
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterable, NamedTuple
+
+import numpy as np
+from scipy import sparse
+
+try:
+    import fcntl  # serializes writers from several worker processes
+except ImportError:  # Windows: one writer process assumed
+    fcntl = None
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Combining diacritical marks: dropped after NFKD so "análisis" and "analisis" are the same token
+_MARKS_RE = re.compile("[\u0300-\u036f]+")
+RRF_K = 60
+FEATURE_CHUNK = 10000  # documents featurized together when building
+
+
+def tokenize(text: str) -> list[str]:
+    text = text.lower()
+    if not text.isascii():
+        text = _MARKS_RE.sub("", unicodedata.normalize("NFKD", text))
+    return _TOKEN_RE.findall(text)
+
+
+def _hash(value: str) -> int:
+    # crc32 rather than hash(): stable across processes and restarts
+    return zlib.crc32(value.encode("utf-8"))
+
+
+@lru_cache(maxsize=65536)
+def _word_vector(word: str, dim: int) -> np.ndarray:
+    # Signed feature hashing of the word's character trigrams; cached since vocabularies repeat a lot
+    padded = f"#{word}#"
+    hashes = [_hash(padded[i:i + 3]) for i in range(max(len(padded) - 2, 1))]
+    vec = np.zeros(dim, dtype=np.float32)
+    np.add.at(vec, [h % dim for h in hashes], [1.0 if h & 0x80000000 else -1.0 for h in hashes])
+    return vec
+
+
+class _Features(NamedTuple):
+    lens: np.ndarray  # tokens per document
+    doc_ptr: np.ndarray  # CSR over (document, term): starts, len = documents + 1
+    doc_term: np.ndarray
+    doc_tf: np.ndarray
+    vectors: np.ndarray  # documents x dim, L2-normalized
+
+
+class HybridIndex:
+    """Append-only BM25 + hashed-vector retrieval index persisted as memory-mapped arrays.
+
+    Terms are hashed into ``buckets`` ids, so there is no vocabulary to keep in sync. Vectors are
+    L2-normalized hashed character trigrams (robust to typos and inflections), ``dim`` floats per
+    document. Rows below ``n_base`` are served from term-major postings; newer rows (the delta)
+    are scored from the document-major arrays until the next merge. Files live in a versioned
+    directory named by ``CURRENT``; readers only look at rows below ``n_docs`` in ``meta.json``,
+    which is replaced atomically after every append, so other processes can keep reading while
+    one writes and pick the change up on their next query.
+    """
+
+    def __init__(self, path: str | os.PathLike, dim: int = 128, buckets: int = 1 << 18,
+                 merge_threshold: int = 2000, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.dim = dim
+        self.buckets = buckets
+        self.merge_threshold = merge_threshold
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._loaded_key = None
+        self._snap = self._empty()
+
+    # ------------------------------------------------------------------ features
+    def _featurize(self, texts: list[str]) -> _Features:
+        """Term counts and vectors for many documents at once: Python only touches each distinct word once."""
+        token_lists = [tokenize(t) for t in texts]
+        lens = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=len(token_lists))
+        vocab: dict[str, int] = {}
+        words = np.fromiter((vocab.setdefault(w, len(vocab)) for tokens in token_lists for w in tokens),
+                            dtype=np.int64, count=int(lens.sum()))
+        rows = np.repeat(np.arange(len(texts)), lens)
+        counts = sparse.csr_matrix((np.ones(len(words), np.float32), (rows, words)), shape=(len(texts), len(vocab)))
+
+        # Distinct words may hash to the same term bucket; the csr constructor keeps duplicates, sum them
+        word_terms = np.fromiter((_hash(w) % self.buckets for w in vocab), dtype=np.int64, count=len(vocab))
+        terms = sparse.csr_matrix((counts.data, word_terms[counts.indices], counts.indptr),
+                                  shape=(len(texts), self.buckets))
+        terms.sum_duplicates()
+
+        word_vectors = np.vstack([_word_vector(w, self.dim) for w in vocab]) if vocab else np.zeros((0, self.dim))
+        vectors = np.asarray(counts @ word_vectors, dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        return _Features(lens, terms.indptr.astype(np.int64), terms.indices.astype(np.int32),
+                         terms.data.astype(np.float32), vectors)
+
+    def _terms(self, tokens: list[str]) -> np.ndarray:
+        return np.unique(np.fromiter((_hash(t) % self.buckets for t in tokens), dtype=np.int32, count=len(tokens)))
+
+    def _vector(self, tokens: list[str]) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in tokens:
+            vec += _word_vector(token, self.dim)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    # ------------------------------------------------------------------ files
+    def _current_dir(self) -> Path | None:
+        try:
+            name = (self.path / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            return None
+        return self.path / name
+
+    @staticmethod
+    def _map(path: Path, dtype, shape: tuple) -> np.ndarray:
+        if not int(np.prod(shape)):
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    def _empty(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            meta={"n_docs": 0, "n_base": 0, "gen": 0, "total_len": 0.0},
+            ids=np.empty(0, np.int64),
+            vectors=np.empty((0, self.dim), np.float32),
+            doc_len=np.empty(0, np.float32),
+            post_ptr=np.zeros(self.buckets + 1, np.int64),
+            post_doc=np.empty(0, np.int32),
+            post_tf=np.empty(0, np.float32),
+            delta={},
+        )
+
+    @property
+    def n_docs(self) -> int:
+        return self._snap.meta["n_docs"]
+
+    def _meta_key(self, directory: Path | None):
+        if directory is None:
+            return None
+        try:
+            return directory.name, (directory / "meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Re-map the files if another process (or a rebuild) changed them since the last look."""
+        directory = self._current_dir()
+        key = self._meta_key(directory)
+        if key == self._loaded_key:
+            return
+        with self._lock:
+            if key == self._loaded_key:
+                return
+            # Readers hold on to the snapshot they started with; swapping the reference is atomic
+            self._snap = self._empty() if key is None else self._load(directory)
+            self._loaded_key = key
+
+    def _load(self, d: Path) -> SimpleNamespace:
+        meta = json.loads((d / "meta.json").read_text())
+        n, g, n_base = meta["n_docs"], meta["gen"], meta["n_base"]
+        doc_ptr = self._map(d / "doc_ptr.i64", np.int64, (n + 1,))
+        nnz = int(doc_ptr[-1])
+        post_ptr = self._map(d / f"post_ptr.{g}.i64", np.int64, (self.buckets + 1,))
+        n_post = int(post_ptr[-1])
+
+        # Rows appended since the last merge: small, kept term-major in memory
+        start = int(doc_ptr[n_base])
+        terms = np.asarray(self._map(d / "doc_term.i32", np.int32, (nnz,))[start:])
+        tfs = np.asarray(self._map(d / "doc_tf.f32", np.float32, (nnz,))[start:])
+        rows = np.repeat(np.arange(n_base, n, dtype=np.int32), np.diff(np.asarray(doc_ptr[n_base:])))
+        order = np.argsort(terms, kind="stable")
+        terms, tfs, rows = terms[order], tfs[order], rows[order]
+        uniq, first = np.unique(terms, return_index=True)
+        bounds = list(first) + [len(terms)]
+
+        return SimpleNamespace(
+            meta=meta,
+            ids=self._map(d / "ids.i64", np.int64, (n,)),
+            vectors=self._map(d / "vectors.f32", np.float32, (n, self.dim)),
+            doc_len=self._map(d / "doc_len.f32", np.float32, (n,)),
+            post_ptr=post_ptr,
+            post_doc=self._map(d / f"post_doc.{g}.i32", np.int32, (n_post,)),
+            post_tf=self._map(d / f"post_tf.{g}.f32", np.float32, (n_post,)),
+            delta={int(t): (rows[bounds[i]:bounds[i + 1]], tfs[bounds[i]:bounds[i + 1]]) for i, t in enumerate(uniq)},
+        )
+
+    def _write_postings(self, d: Path, gen: int, n: int, doc_ptr: np.ndarray, doc_term: np.ndarray,
+                        doc_tf: np.ndarray):
+        rows = np.repeat(np.arange(n, dtype=np.int32), np.diff(doc_ptr[:n + 1]))
+        terms = doc_term[:int(doc_ptr[n])]
+        order = np.argsort(terms, kind="stable")
+        counts = np.bincount(terms, minlength=self.buckets)
+        post_ptr = np.zeros(self.buckets + 1, np.int64)
+        np.cumsum(counts, out=post_ptr[1:])
+        post_ptr.tofile(d / f"post_ptr.{gen}.i64")
+        rows[order].tofile(d / f"post_doc.{gen}.i32")
+        np.asarray(doc_tf[:int(doc_ptr[n])])[order].tofile(d / f"post_tf.{gen}.f32")
+
+    @staticmethod
+    def _write_meta(d: Path, meta: dict):
+        tmp = d / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, d / "meta.json")
+
+    @contextmanager
+    def _exclusive(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._write_lock, open(self.path / ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    # ------------------------------------------------------------------ writes
+    def build(self, docs: Iterable[tuple[int, str]]) -> int:
+        """Write a fresh index for ``docs`` ((id, text) pairs) and switch readers over to it."""
+        ids, chunks, batch = [], [], []
+        for doc_id, text in docs:
+            ids.append(doc_id)
+            batch.append(text)
+            if len(batch) >= FEATURE_CHUNK:
+                chunks.append(self._featurize(batch))
+                batch = []
+        if batch or not chunks:
+            chunks.append(self._featurize(batch))
+        n = len(ids)
+        lens = np.concatenate([c.lens for c in chunks])
+        doc_term = np.concatenate([c.doc_term for c in chunks])
+        doc_tf = np.concatenate([c.doc_tf for c in chunks])
+        doc_ptr = np.concatenate([[0], np.cumsum(np.concatenate([np.diff(c.doc_ptr) for c in chunks]))]).astype(np.int64)
+        vectors = np.vstack([c.vectors for c in chunks])
+        del chunks
+
+        with self._exclusive():
+            previous = self._current_dir()
+            d = self.path / f"v{int.from_bytes(os.urandom(4), 'big'):08x}"
+            d.mkdir(parents=True)
+            np.asarray(ids, np.int64).tofile(d / "ids.i64")
+            vectors.tofile(d / "vectors.f32")
+            doc_ptr.tofile(d / "doc_ptr.i64")
+            doc_term.tofile(d / "doc_term.i32")
+            doc_tf.tofile(d / "doc_tf.f32")
+            lens.astype(np.float32).tofile(d / "doc_len.f32")
+            self._write_postings(d, 0, n, doc_ptr, doc_term, doc_tf)
+            self._write_meta(d, {"n_docs": n, "n_base": n, "gen": 0, "total_len": float(lens.sum()),
+                                 "dim": self.dim, "buckets": self.buckets})
+            tmp = self.path / "CURRENT.tmp"
+            tmp.write_text(d.name)
+            os.replace(tmp, self.path / "CURRENT")
+            if previous is not None:
+                # Open memory maps keep the old files readable on POSIX; elsewhere the delete may fail
+                shutil.rmtree(previous, ignore_errors=True)
+        self.refresh()
+        return n
+
+    def add(self, doc_id: int, text: str):
+        """Append one document; see ``add_many``."""
+        self.add_many([(doc_id, text)])
+
+    def add_many(self, docs: Iterable[tuple[int, str]]):
+        """Append documents; folds the delta into the postings once it grows past ``merge_threshold``."""
+        docs = list(docs)
+        if not docs:
+            return
+        if self._current_dir() is None:
+            self.build(docs)
+            return
+        features = self._featurize([text for _, text in docs])
+        with self._exclusive():
+            d = self._current_dir()
+            meta = json.loads((d / "meta.json").read_text())
+            n = meta["n_docs"]
+            last = int(np.fromfile(d / "doc_ptr.i64", dtype=np.int64, count=1, offset=n * 8)[0])
+            # Appends go past any rows a crashed writer left behind: truncate to what meta says exists
+            for name, size in (("ids.i64", n * 8), ("vectors.f32", n * self.dim * 4), ("doc_ptr.i64", (n + 1) * 8),
+                               ("doc_term.i32", last * 4), ("doc_tf.f32", last * 4), ("doc_len.f32", n * 4)):
+                with open(d / name, "r+b") as f:
+                    f.truncate(size)
+            for name, array in (("ids.i64", np.asarray([doc_id for doc_id, _ in docs], np.int64)),
+                                ("vectors.f32", features.vectors),
+                                ("doc_term.i32", features.doc_term),
+                                ("doc_tf.f32", features.doc_tf),
+                                ("doc_len.f32", features.lens.astype(np.float32)),
+                                ("doc_ptr.i64", last + features.doc_ptr[1:])):
+                with open(d / name, "ab") as f:
+                    array.tofile(f)
+            meta.update(n_docs=n + len(docs), total_len=meta["total_len"] + float(features.lens.sum()))
+
+            if meta["n_docs"] - meta["n_base"] > self.merge_threshold:
+                gen = meta["gen"] + 1
+                doc_ptr = np.fromfile(d / "doc_ptr.i64", dtype=np.int64)
+                self._write_postings(d, gen, meta["n_docs"], doc_ptr, np.fromfile(d / "doc_term.i32", np.int32),
+                                     np.fromfile(d / "doc_tf.f32", np.float32))
+                old_gen = meta["gen"]
+                meta.update(gen=gen, n_base=meta["n_docs"])
+                self._write_meta(d, meta)
+                for prefix in ("post_ptr", "post_doc", "post_tf"):
+                    for old in d.glob(f"{prefix}.{old_gen}.*"):
+                        try:
+                            old.unlink()
+                        except OSError:
+                            pass
+            else:
+                self._write_meta(d, meta)
+        self.refresh()
+
+    # ------------------------------------------------------------------ reads
+    def _bm25(self, snap: SimpleNamespace, terms: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+        avgdl = max(snap.meta["total_len"] / n, 1.0)
+        docs, weights = [], []
+        for t in terms.tolist():
+            lo, hi = int(snap.post_ptr[t]), int(snap.post_ptr[t + 1])
+            d, tf = np.asarray(snap.post_doc[lo:hi]), np.asarray(snap.post_tf[lo:hi])
+            if t in snap.delta:
+                dd, dtf = snap.delta[t]
+                d, tf = np.concatenate([d, dd]), np.concatenate([tf, dtf])
+            if not len(d):
+                continue
+            idf = np.log1p((n - len(d) + 0.5) / (len(d) + 0.5))
+            dl = snap.doc_len[d]
+            docs.append(d)
+            weights.append(idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avgdl)))
+        if not docs:
+            return np.empty(0, np.int32), np.empty(0, np.float32)
+        candidates, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        return candidates, np.bincount(inverse, weights=np.concatenate(weights))
+
+    @staticmethod
+    def _top(rows: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        if len(rows) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[part], scores[part]
+        return rows[np.argsort(-scores, kind="stable")]
+
+    def search(self, text: str, k: int = 10, candidates: int = 100) -> list[tuple[int, float]]:
+        """Top ``k`` (doc id, score) by reciprocal rank fusion of the BM25 and vector rankings."""
+        self.refresh()
+        snap = self._snap
+        n = snap.meta["n_docs"]
+        tokens = tokenize(text)
+        if not n or not tokens:
+            return []
+        terms = self._terms(tokens)
+
+        rows, scores = self._bm25(snap, terms, n)
+        lexical = self._top(rows, scores, candidates)
+
+        sims = snap.vectors @ self._vector(tokens)
+        positive = np.flatnonzero(sims > 0)
+        semantic = self._top(positive, sims[positive], candidates)
+
+        fused: dict[int, float] = {}
+        for ranking in (lexical, semantic):
+            for rank, row in enumerate(ranking.tolist()):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+        best = sorted(fused.items(), key=lambda kv: -kv[1])[:k]
+        return [(int(snap.ids[row]), score) for row, score in best]
+
+    def stats(self) -> dict:
+        meta = self._snap.meta
+        return {
+            "documents": meta["n_docs"],
+            "merged": meta["n_base"],
+            "delta": meta["n_docs"] - meta["n_base"],
+            "dim": self.dim,
+            "buckets": self.buckets,
+        }
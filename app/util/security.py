@@ -1,6 +1,32 @@
+import asyncio
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import jwt
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from app.util.log_time import log_time
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=int(os.getenv("ARGON2_TIME_COST", "3")),
+    argon2__memory_cost=int(os.getenv("ARGON2_MEMORY_COST", "65536")),
+    argon2__parallelism=int(os.getenv("ARGON2_PARALLELISM", "4")),
+)
+
+# argon2 releases the GIL, so a small thread pool keeps hashing off the event loop.
+# Work beyond workers + queue is rejected instead of piling up behind a login burst.
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="argon2")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
 
 
 def hash_password(password: str) -> str:
@@ -9,3 +35,87 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+async def _run_bounded(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiadas solicitudes, intenta de nuevo",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        future = _hash_executor.submit(fn, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    # Release when the worker is actually done, even if the awaiting request was cancelled
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bounded(pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify off the event loop; also returns a new hash when the stored one uses outdated parameters."""
+    return await _run_bounded(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+# -------------------------------------------- TOKENS --------------------------------------------
+JWT_ALGORITHM = "HS256"
+JWT_EXPIRES_SECONDS = int(os.getenv("JWT_EXPIRES_MINUTES", "60")) * 60
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+
+
+def _load_signing_keys() -> dict[str, str]:
+    # JWT_KEYS="kid2:secret2,kid1:secret1" - the first key signs, all of them verify (rotation)
+    raw = os.getenv("JWT_KEYS", "").strip()
+    keys = {}
+    for item in raw.split(","):
+        kid, sep, secret = item.strip().partition(":")
+        if sep and kid and secret:
+            keys[kid] = secret
+    if not keys:
+        # A per-process key only works for a single process: tokens fail on every other worker and after a restart
+        if os.getenv("JWT_ALLOW_RANDOM_KEY", "").strip().lower() not in ("1", "true", "yes", "on"):
+            raise RuntimeError("JWT_KEYS is not set; configure the shared signing keys "
+                               "(or JWT_ALLOW_RANDOM_KEY=1 for a single local process)")
+        log_time("⚠️:       JWT_KEYS not set, using a per-process random key (JWT_ALLOW_RANDOM_KEY)")
+        keys["local"] = secrets.token_urlsafe(32)
+    return keys
+
+
+SIGNING_KEYS = _load_signing_keys()
+ACTIVE_KID = next(iter(SIGNING_KEYS))
+
+
+def create_access_token(user_id: int) -> str:
+    now = int(time.time())
+    claims = {"sub": str(user_id), "iat": now, "exp": now + JWT_EXPIRES_SECONDS}
+    return jwt.encode(claims, SIGNING_KEYS[ACTIVE_KID], algorithm=JWT_ALGORITHM, headers={"kid": ACTIVE_KID})
+
+
+@lru_cache(maxsize=JWT_CACHE_SIZE)
+def _decode_access_token(token: str) -> dict:
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid not in SIGNING_KEYS:
+        raise jwt.InvalidTokenError("Unknown signing key")
+    return jwt.decode(token, SIGNING_KEYS[kid], algorithms=[JWT_ALGORITHM], options={"require": ["exp", "sub"]})
+
+
+def verify_access_token(token: str | None) -> dict | None:
+    """Return the token claims, or None if the token is missing, invalid or expired.
+
+    Signature checks are cached per token; only the expiry is re-checked on a hit.
+    """
+    if not token:
+        return None
+    try:
+        claims = _decode_access_token(token)
+    except jwt.InvalidTokenError:
+        return None
+    if claims["exp"] <= time.time():
+        return None
+    return claims
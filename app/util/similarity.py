@@ -0,0 +1,70 @@
+import numpy as np
+from scipy import sparse
+
+# Items scored at once; a block holds the (sparse) similarities of these items to every other item
+BLOCK_ROWS = 1024
+
+
+def _normalize_rows(m: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(m).tocsr()
+
+
+def item_neighbors(interactions: sparse.spmatrix, item_tags: sparse.spmatrix, k: int = 50,
+                   tag_weight: float = 0.3) -> tuple[np.ndarray, np.ndarray]:
+    """Top-``k`` most similar items for every item.
+
+    Similarity blends cosine co-occurrence over users (``interactions``: users x items,
+    weighted) with cosine tag overlap (``item_tags``: items x tags). Items are scored in
+    blocks of rows so memory stays bounded however large the catalog is.
+    Returns ``(neighbors, scores)``, both ``items x k``; missing slots hold -1 / 0.
+    """
+    n_items = interactions.shape[1]
+    k = max(min(k, n_items - 1), 0)
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+
+    by_item = _normalize_rows(sparse.csr_matrix(interactions).T.tocsr())
+    by_item_t = by_item.T.tocsr()
+    tags = _normalize_rows(sparse.csr_matrix(item_tags))
+    tags_t = tags.T.tocsr()
+
+    # Only pairs that share a user or a tag score above zero, so the blocks stay sparse: the work
+    # follows the number of such pairs rather than items x items
+    for start in range(0, n_items, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, n_items)
+        sim = (1.0 - tag_weight) * by_item[start:stop].dot(by_item_t)
+        if tag_weight:
+            sim = sim + tag_weight * tags[start:stop].dot(tags_t)
+        sim = sparse.csr_matrix(sim)
+        rows = np.repeat(np.arange(stop - start), np.diff(sim.indptr))
+        # An item is not its own neighbour
+        keep = (sim.data > 0) & (sim.indices != rows + start)
+        rows, cols, values = rows[keep], sim.indices[keep], sim.data[keep]
+
+        order = np.lexsort((-values, rows))  # by row, best first
+        rows, cols, values = rows[order], cols[order], values[order]
+        first = np.searchsorted(rows, np.arange(stop - start))
+        rank = np.arange(len(rows)) - first[rows]
+        top = rank < k
+        neighbors[rows[top] + start, rank[top]] = cols[top]
+        scores[rows[top] + start, rank[top]] = values[top]
+    return neighbors, scores
+
+
+def score_from_neighbors(neighbors: np.ndarray, scores: np.ndarray, items: np.ndarray,
+                         weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Merge the neighbour lists of ``items`` (weighted); returns candidate items and their summed scores.
+
+    Touches only ``len(items) * k`` cells, independent of the number of users or items.
+    """
+    nb = neighbors[items]
+    sc = scores[items] * weights[:, None]
+    mask = nb >= 0
+    if not mask.any():
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    candidates, inverse = np.unique(nb[mask], return_inverse=True)
+    return candidates, np.bincount(inverse, weights=sc[mask]).astype(np.float32)
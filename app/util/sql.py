@@ -0,0 +1,100 @@
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from sqlalchemy import and_, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def has_upsert(db: Session) -> bool:
+    return db.get_bind().dialect.name in _UPSERT_INSERTS
+
+
+def dialect_insert(db: Session, table):
+    """``INSERT`` construct of the session's dialect, which carries ``on_conflict_do_*``; ``None`` elsewhere."""
+    make = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    return make(table) if make is not None else None
+
+
+class _Excluded:
+    """The generic path's stand-in for ``excluded``: one row's values as typed bind parameters."""
+
+    def __init__(self, table, row: dict):
+        self._table, self._row = table, row
+
+    def __getattr__(self, name: str):
+        return self[name]
+
+    def __getitem__(self, name: str):
+        return literal(self._row[name], type_=self._table.c[name].type)
+
+
+def upsert(
+        db: Session,
+        table,
+        rows: Sequence[dict],
+        index_elements: Sequence[str],
+        *,
+        set_: Optional[Callable[[Any], dict]] = None,
+        where: Optional[Callable[[Any], Any]] = None,
+        returning: Iterable = (),
+) -> list:
+    """``INSERT ... ON CONFLICT DO UPDATE`` (``DO NOTHING`` without ``set_``) in the caller's transaction.
+
+    ``set_`` and ``where`` take the ``excluded`` pseudo-table and build the update. Rows that were
+    inserted or updated come back with the ``returning`` columns, as with ``RETURNING``.
+
+    SQLite and Postgres get the native statement. Other dialects take the generic path: per row,
+    insert when the key is missing (in a savepoint, so a concurrent insert of the same key turns
+    into the update instead of failing the transaction), else update where ``where`` holds.
+    """
+    returning = list(returning)
+    stmt = dialect_insert(db, table)
+    if stmt is not None:
+        stmt = stmt.values(list(rows))
+        if set_ is None:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+        else:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(index_elements),
+                set_=set_(stmt.excluded),
+                where=where(stmt.excluded) if where is not None else None,
+            )
+        if not returning:
+            db.execute(stmt)
+            return []
+        return db.execute(stmt.returning(*returning)).all()
+
+    key_columns = [table.c[k] for k in index_elements]
+    changed = []
+    for row in rows:
+        key = and_(*(c == row[c.name] for c in key_columns))
+        if not _exists(db, key_columns, key):
+            try:
+                with db.begin_nested():
+                    db.execute(insert(table).values(row))
+            except IntegrityError:
+                # Only a key conflict (someone inserted it meanwhile) becomes the update; a foreign key
+                # violation fails here just as it fails the native statement
+                if not _exists(db, key_columns, key):
+                    raise
+            else:
+                changed.append(key)
+                continue
+        if set_ is None:
+            continue
+        excluded = _Excluded(table, row)
+        condition = key if where is None else and_(key, where(excluded))
+        if db.execute(update(table).where(condition).values(set_(excluded))).rowcount:
+            changed.append(key)
+
+    if not returning:
+        return []
+    return [db.execute(select(*returning).where(key)).one() for key in changed]
+
+
+def _exists(db: Session, key_columns: list, key) -> bool:
+    return db.execute(select(*key_columns).where(key)).first() is not None
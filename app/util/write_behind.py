@@ -0,0 +1,109 @@
+import asyncio
+from contextlib import suppress
+from typing import Awaitable, Callable, Hashable
+
+from app.util.log_time import log_time
+
+
+class WriteBehindBuffer:
+    """Coalesces writes per key in memory and hands them to ``flush`` in batches.
+
+    ``put`` merges the new fields into whatever is pending for the key, so a burst of
+    updates to the same row becomes a single write. Batches go out every ``interval``
+    seconds, or sooner once ``max_pending`` keys are waiting. Entries that are being
+    flushed stay visible through ``pending`` until the write has finished, and a failed
+    flush puts them back (newer updates made meanwhile win).
+    """
+
+    def __init__(self, interval: float = 2.0, max_pending: int = 500):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: dict[Hashable, dict] = {}
+        self._flushing: dict[Hashable, dict] = {}
+        self._flush_fn: Callable[[list[dict]], Awaitable[None]] | None = None
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._inflight: asyncio.Future | None = None
+        self.puts = 0
+        self.flushes = 0
+        self.flushed_entries = 0
+        self.failures = 0
+
+    def put(self, key: Hashable, fields: dict) -> dict:
+        entry = self._pending.setdefault(key, {})
+        entry.update(fields)
+        self.puts += 1
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+        return entry
+
+    def pending(self, key: Hashable) -> dict | None:
+        flushing, pending = self._flushing.get(key), self._pending.get(key)
+        if flushing and pending:
+            return {**flushing, **pending}
+        return pending or flushing
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending or self._flush_fn is None:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            batch = self._flushing
+            try:
+                await self._flush_fn(list(batch.values()))
+            except BaseException:
+                # Cancellation included: the batch may or may not have been written, and writing
+                # it again is harmless, losing it is not (newer updates made meanwhile win)
+                self.failures += 1
+                for key, entry in batch.items():
+                    self._pending[key] = {**entry, **self._pending.get(key, {})}
+                raise
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            self.flushed_entries += len(batch)
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # Shielded: stopping the loop must not cut a write short (with the sync engine the
+            # worker thread would keep using a session that is being closed); stop() waits for it
+            self._inflight = asyncio.ensure_future(self.flush())
+            try:
+                await asyncio.shield(self._inflight)
+            except Exception as exc:
+                log_time(f"⚠️:       Write-behind flush failed, retrying later: {exc!r}")
+
+    def start(self, flush: Callable[[list[dict]], Awaitable[None]]):
+        self._flush_fn = flush
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._inflight is not None:
+            await asyncio.gather(self._inflight, return_exceptions=True)
+            self._inflight = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "max_pending": self.max_pending,
+            "pending": len(self._pending),
+            "puts": self.puts,
+            "flushes": self.flushes,
+            "flushed_entries": self.flushed_entries,
+            "coalesced": max(self.puts - self.flushed_entries - len(self._pending), 0),
+            "failures": self.failures,
+        }
@@ -0,0 +1,225 @@
+"""Helpers shared by the benchmark scripts: an isolated app environment, seeding, a server, a load loop.
+
+The scripts need the packages in requirements-dev.txt.
+"""
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, NamedTuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+TOKEN = "bench-token"
+HEADERS = {"Auth-token": TOKEN}
+
+
+def bench_env(**extra: str) -> dict[str, str]:
+    """Environment for a throwaway app instance: its own SQLite file, index and upload directories."""
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+        "RETRIEVAL_INDEX_DIR": f"{tmp}/retrieval",
+        "UPLOAD_ROOT": f"{tmp}/uploads",
+        "JWT_KEYS": "bench:bench-secret",
+        "LEGACY_AUTH_TOKEN": TOKEN,
+        "RECOMMENDER_REBUILD_SECONDS": "86400",
+        **extra,
+    }
+
+
+def seed(db_url: str, *, courses: int, users: int = 0, progress_per_user: int = 0, tags_per_course: int = 2,
+         password_hash: str = "x"):
+    """Bulk-insert courses (with tags), users, progress rows and their dashboards straight through Core."""
+    sys.path.insert(0, str(ROOT))
+    from sqlalchemy import create_engine, insert
+
+    from app.model import model as models
+
+    engine = create_engine(db_url)
+    models.Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.Course.__table__), [
+            {"id": i, "title": f"Course {i}", "description": f"About topic {i % 97}", "duration_seconds": 600 + i,
+             "format": "video", "course_type": "self_paced", "rating_avg": (i % 50) / 10, "rating_count": 0,
+             "requires_certificate": False, "is_downloaded": False,
+             "created_at": now, "updated_at": now}
+            for i in range(1, courses + 1)
+        ])
+        if tags_per_course:
+            conn.execute(insert(models.CourseTag.__table__), [
+                {"course_id": i, "tag": f"tag{(i + t) % 40}"} for i in range(1, courses + 1) for t in range(tags_per_course)
+            ])
+        if users:
+            conn.execute(insert(models.User.__table__), [
+                {"id": u, "name": f"User {u}", "email": f"user{u}@bench.local", "password": password_hash,
+                 "active": True, "created_at": now, "updated_at": now}
+                for u in range(1, users + 1)
+            ])
+        if users and progress_per_user:
+            rows = []
+            for u in range(1, users + 1):
+                for k in range(min(progress_per_user, courses)):
+                    rows.append({"user_id": u, "course_id": (u * 7 + k * 13) % courses + 1, "progress": 50.0,
+                                 "is_downloaded": False, "updated_at": now})
+            # (user, course) pairs can repeat for small catalogs; keep the first
+            unique = {(r["user_id"], r["course_id"]): r for r in rows}
+            conn.execute(insert(models.CourseProgress.__table__), list(unique.values()))
+    if users:
+        # Filled up front, so the app's first-deploy dashboard rebuild does not run during the measurement
+        from sqlalchemy.orm import Session
+
+        from app.service.dashboard_service import _rebuild
+        with Session(engine) as db:
+            _rebuild(db)
+    engine.dispose()
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(syllables, k=3)))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def seed_text_catalog(env: dict[str, str], *, courses: int, users: int = 0, vocabulary_size: int = 20_000) -> list[str]:
+    """Seed ``courses`` whose titles and descriptions come from a skewed vocabulary of made-up words.
+
+    Word i is drawn with weight 1 / (i + 1) ** 0.8, 15 words per course: word 0 ends up in about a
+    third of the courses, word 5000 in a few dozen; every description also says "topic". The search
+    and retrieval indexes are built here, as the app would at startup, so the server comes up without
+    a minute of indexing. Returns the vocabulary, commonest word first.
+    """
+    # No tags: the seeded ones are few and shared by thousands of courses each, which only slows the
+    # startup recommender build
+    seed(env["DATABASE_URL"], courses=courses, users=users, tags_per_course=0)
+    os.environ["RETRIEVAL_INDEX_DIR"] = env["RETRIEVAL_INDEX_DIR"]
+    from sqlalchemy import bindparam, create_engine, update
+    from sqlalchemy.orm import Session
+
+    from app.model import model as models
+    from app.service import retrieval_service, search_service
+
+    rng = random.Random(18)
+    vocabulary = _vocabulary(rng, vocabulary_size)
+    weights = [1 / (i + 1) ** 0.8 for i in range(vocabulary_size)]
+
+    def words(n: int) -> str:
+        return " ".join(rng.choices(vocabulary, weights, k=n))
+
+    engine = create_engine(env["DATABASE_URL"])
+    table = models.Course.__table__
+    with Session(engine) as db:
+        db.execute(
+            update(table).where(table.c.id == bindparam("course_id"))
+            .values(title=bindparam("title"), description=bindparam("description")),
+            [{"course_id": i, "title": f"{words(3)} {i}", "description": f"{words(12)} topic {i % 97}"}
+             for i in range(1, courses + 1)],
+        )
+        db.commit()
+        search_service.rebuild_search_index(db)
+        retrieval_service.rebuild_retrieval_index(db)
+    engine.dispose()
+    return vocabulary
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve(env: dict[str, str], workers: int = 1):
+    """Run the app under uvicorn in a subprocess; yields its base URL once startup work is done."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                stats = httpx.get(f"{url}/metrics/recommendations", headers=HEADERS, timeout=1)
+                # Up, and done with the startup recommender build
+                if stats.status_code == 200 and stats.json().get("ready"):
+                    break
+            except httpx.TransportError:
+                pass
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("server did not start")
+            time.sleep(0.2)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+class LoadResult(NamedTuple):
+    latencies: list[float]  # seconds, successful requests only
+    statuses: dict[int, int]
+    elapsed: float
+
+
+async def load(url: str, request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]], *,
+               concurrency: int, duration: float) -> LoadResult:
+    """``concurrency`` clients calling ``request(client, n)`` back to back for ``duration`` seconds."""
+    latencies, statuses = [], {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, headers=HEADERS, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(w: int):
+            n = w
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await request(client, n)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code < 400:
+                    latencies.append(time.perf_counter() - start)
+                n += concurrency
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        return LoadResult(latencies, statuses, time.perf_counter() - started)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def report(name: str, result: LoadResult) -> str:
+    ms = [v * 1000 for v in result.latencies]
+    return (f"{name:<28} {len(ms) / result.elapsed:8.1f} req/s   p50 {percentile(ms, 50):7.1f} ms   "
+            f"p99 {percentile(ms, 99):7.1f} ms   max {max(ms, default=float('nan')):7.1f} ms   "
+            f"statuses {dict(sorted(result.statuses.items()))}")
+
+
+async def settle():
+    """Wait out the startup recommender build so it does not compete with the measured requests."""
+    from app.service import recommendation_service
+    await recommendation_service._ready.wait()
+
+
+def median_ms(samples: list[float]) -> float:
+    return statistics.median(samples) * 1000
@@ -0,0 +1,113 @@
+"""Bulk NDJSON import and export: time and peak memory at growing catalog sizes, CLI and HTTP.
+
+For each size an NDJSON file of courses (with tags and learning goals) is written, then loaded into
+an empty database with ``python -m app.catalog_cli import`` and written back out with ``export``.
+Each CLI run is a subprocess whose peak RSS is read from its rusage; the ``--help`` run shows what
+the interpreter and the app's imports take on their own. The database side of both paths works a
+chunk at a time, so export memory stays flat as the catalog grows. Import memory also carries the
+chat retrieval index: its word-vector cache, capped at 65536 words (about 40 MiB, which the numbered
+titles fill), and its periodic merges, which read every document's terms. The largest catalog is
+then exported and re-imported over HTTP from one uvicorn worker.
+
+    python bench/catalog.py [--sizes 25000,100000,200000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from _common import HEADERS, ROOT, bench_env, serve  # noqa: E402
+
+
+def _write_ndjson(path: Path, courses: int):
+    with open(path, "w") as out:
+        for i in range(1, courses + 1):
+            out.write(json.dumps({
+                "title": f"Course {i}",
+                "description": f"About topic {i % 97}, part {i % 13}",
+                "duration_seconds": 600 + i % 3000,
+                "format": "video",
+                "tags": [f"tag{i % 400}", f"tag{(i * 7) % 400}"],
+                "learning_goals": [f"goal {i % 50}", f"goal {i % 31}"],
+            }) + "\n")
+
+
+def _env() -> dict[str, str]:
+    # SQLite's memory map would count the database pages read as RSS, growing with the file
+    return bench_env(SQLITE_MMAP_SIZE="0")
+
+
+def _cli(env: dict[str, str], *args: str, stdin=None, stdout=None) -> tuple[float, int, int]:
+    """Run the catalog CLI; returns (seconds, peak RSS in MiB, exit status)."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "app.catalog_cli", *args], cwd=ROOT, env=env,
+                            stdin=stdin, stdout=stdout or subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return time.perf_counter() - started, usage.ru_maxrss // 1024, proc.returncode
+
+
+async def _http(url: str, exported: Path) -> tuple[float, float, int, float, dict]:
+    async with httpx.AsyncClient(base_url=url, headers=HEADERS, timeout=None) as client:
+        started = time.perf_counter()
+        first_byte, lines = None, 0
+        async with client.stream("GET", "/course/export") as response:
+            with open(exported, "wb") as out:
+                async for chunk in response.aiter_bytes():
+                    first_byte = first_byte or time.perf_counter() - started
+                    lines += chunk.count(b"\n")
+                    out.write(chunk)
+        export_seconds = time.perf_counter() - started
+
+        async def body():
+            with open(exported, "rb") as src:
+                while chunk := src.read(1024 * 1024):
+                    yield chunk
+
+        started = time.perf_counter()
+        response = await client.post("/course/import", content=body(),
+                                     headers={"Content-Type": "application/x-ndjson"})
+        return export_seconds, first_byte, lines, time.perf_counter() - started, response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="25000,100000,200000")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    _, idle_rss, _ = _cli(_env(), "--help")
+    print(f"catalog CLI with nothing to do: {idle_rss} MiB peak RSS")
+    for courses in sizes:
+        env = _env()
+        tmp = Path(env["DATABASE_URL"].removeprefix("sqlite:///")).parent
+        source, exported = tmp / "courses.ndjson", tmp / "exported.ndjson"
+        _write_ndjson(source, courses)
+        with open(source, "rb") as src:
+            seconds, rss, status = _cli(env, "import", stdin=src)
+        print(f"{courses:>7} courses  import {seconds:6.1f}s ({courses / seconds:7.0f}/s)   peak RSS {rss:4d} MiB"
+              f"   exit {status}")
+        with open(exported, "wb") as out:
+            seconds, rss, status = _cli(env, "export", stdout=out)
+        with open(exported, "rb") as f:
+            lines = sum(1 for _ in f)
+        print(f"{'':>16}export {seconds:6.1f}s ({lines / seconds:7.0f}/s)   peak RSS {rss:4d} MiB"
+              f"   {lines} lines, exit {status}")
+
+    # Over HTTP: export the largest catalog and import it again (every line collides with an existing id)
+    with serve(env) as url:
+        export_seconds, first_byte, lines, import_seconds, result = asyncio.run(_http(url, tmp / "http.ndjson"))
+    print(f"HTTP export of {lines} courses: first byte after {first_byte * 1000:.0f} ms, all in {export_seconds:.1f}s")
+    print(f"HTTP re-import: {import_seconds:.1f}s, imported {result['imported']}, failed {result['failed']} "
+          f"(duplicate ids, reported per line)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Chat grounding at 100k courses: retrieval index build, top-k retrieval, incremental adds, and the SSE stream.
+
+The catalog comes from ``seed_text_catalog``. Retrieval is timed in-process on the index the app
+shares between workers: ``--queries`` chat-like messages mixing common and rare words, top
+``CHAT_CONTEXT_COURSES``. Then ``POST /chat/stream`` runs from 1, 16 and 64 clients at once against
+one uvicorn worker, each client with its own access token (answers are limited per user), with the
+fake backend pausing ``CHAT_FAKE_TOKEN_DELAY_MS`` per word like a model would. Reported: time to the
+``sources`` event (retrieval plus course summaries), to the first token, and to ``done``.
+
+    python bench/chat.py [--courses 100000] [--queries 2000] [--concurrency 1,16,64] [--duration 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from _common import bench_env, load, percentile, report, seed_text_catalog, serve  # noqa: E402
+
+TOKEN_DELAY_MS = "20"
+
+
+def _messages(vocabulary: list[str], n: int) -> list[str]:
+    rng = random.Random(22)
+    return [f"what should I take to learn {rng.choice(vocabulary[:50])} and {rng.choice(vocabulary[50:5000])}"
+            for _ in range(n)]
+
+
+def _ms(values: list[float]) -> str:
+    ms = [v * 1000 for v in values]
+    return f"p50 {percentile(ms, 50):7.2f} ms   p99 {percentile(ms, 99):7.2f} ms"
+
+
+def _retrieval(vocabulary: list[str], queries: int, new_courses: int):
+    from app.service import chat_service, retrieval_service
+
+    index = retrieval_service.retrieval_index
+    index.refresh()
+    k = chat_service.CONTEXT_COURSES
+    latencies = []
+    for message in _messages(vocabulary, queries):
+        started = time.perf_counter()
+        index.search(message, k)
+        latencies.append(time.perf_counter() - started)
+    print(f"retrieve top {k} of {index.n_docs}    {_ms(latencies)}   over {queries} messages")
+
+    adds = []
+    for i in range(new_courses):
+        started = time.perf_counter()
+        index.add(10_000_000 + i, f"{vocabulary[i]} {vocabulary[i + 1]} new course")
+        adds.append(time.perf_counter() - started)
+    print(f"add one course             {_ms(adds)}   max {max(adds) * 1000:7.2f} ms over {new_courses} "
+          f"(merges into the base every {index.merge_threshold})")
+
+
+def _stream(tokens: list[str], messages: list[str], concurrency: int, marks: dict[str, list[float]]):
+    async def request(client: httpx.AsyncClient, n: int):
+        started = time.perf_counter()
+        seen = set()
+        # One user per client: worker w always gets n % concurrency == w
+        headers = {"Auth-token": tokens[n % concurrency]}
+        async with client.stream("POST", "/chat/stream", json={"message": messages[n % len(messages)]},
+                                 headers=headers) as response:
+            async for line in response.aiter_lines():
+                event = line.removeprefix("event: ") if line.startswith("event: ") else None
+                if event in ("sources", "token") and event not in seen:
+                    seen.add(event)
+                    marks[event].append(time.perf_counter() - started)
+        return response
+    return request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--adds", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    env = bench_env(CHAT_FAKE_TOKEN_DELAY_MS=os.environ.get("CHAT_FAKE_TOKEN_DELAY_MS", TOKEN_DELAY_MS))
+    started = time.perf_counter()
+    vocabulary = seed_text_catalog(env, courses=args.courses, users=max(levels))
+    print(f"seeded and indexed {args.courses} courses in {time.perf_counter() - started:.1f}s")
+
+    os.environ["JWT_KEYS"] = env["JWT_KEYS"]
+    from app.util.security import create_access_token
+
+    # Timed before the adds below change the index the server starts from
+    with serve(env) as url:
+        tokens = [create_access_token(u) for u in range(1, max(levels) + 1)]
+        messages = _messages(vocabulary, 500)
+        print(f"fake backend: {env['CHAT_FAKE_TOKEN_DELAY_MS']} ms per word")
+        for concurrency in levels:
+            marks = {"sources": [], "token": []}
+            result = asyncio.run(load(url, _stream(tokens, messages, concurrency, marks),
+                                      concurrency=concurrency, duration=args.duration))
+            print(report(f"stream x{concurrency} (to done)", result))
+            print(f"  to sources {_ms(marks['sources'])}   to first token {_ms(marks['token'])}")
+
+    _retrieval(vocabulary, args.queries, args.adds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Throughput of one uvicorn worker on DB-bound endpoints with the sync engine (DB_ASYNC=0) and the async one (DB_ASYNC=1).
+
+Both runs serve the same seeded SQLite database from a subprocess; ``--concurrency`` httpx clients
+call the endpoint back to back for ``--duration`` seconds. Besides the DB-bound endpoints, ``/ping``
+is measured under the same load from a separate client, which shows whether the event loop stays free.
+
+    python bench/load.py [--concurrency 100] [--duration 10] [--courses 1000] [--users 1000]
+"""
+import argparse
+import asyncio
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from _common import HEADERS, bench_env, load, median_ms, percentile, report, seed, serve  # noqa: E402
+
+SCENARIOS = {
+    "progress": lambda users, courses: lambda client, n: client.get(
+        f"/course/{n % courses + 1}/progress/{n % users + 1}"),
+    "catalog page": lambda users, courses: lambda client, n: client.get(
+        f"/course/{n % users + 1}", params={"limit": 20, "cursor": n % courses}),
+}
+
+
+async def _ping_during(url: str, stop: asyncio.Event) -> list[float]:
+    samples = []
+    async with httpx.AsyncClient(base_url=url, headers=HEADERS) as client:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await client.get("/ping")
+            samples.append(time.perf_counter() - started)
+            await asyncio.sleep(0.05)
+    return samples
+
+
+async def _run(url: str, request, concurrency: int, duration: float):
+    stop = asyncio.Event()
+    pinger = asyncio.create_task(_ping_during(url, stop))
+    result = await load(url, request, concurrency=concurrency, duration=duration)
+    stop.set()
+    return result, await pinger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--courses", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    template = bench_env()
+    seed(template["DATABASE_URL"], courses=args.courses, users=args.users, progress_per_user=20)
+    seeded = Path(template["DATABASE_URL"].removeprefix("sqlite:///"))
+
+    print(f"{args.concurrency} concurrent clients, {args.duration:g}s per run, 1 worker")
+    for name, make in SCENARIOS.items():
+        for mode in ("0", "1"):
+            env = bench_env(DB_ASYNC=mode)
+            shutil.copy(seeded, env["DATABASE_URL"].removeprefix("sqlite:///"))
+            with serve(env) as url:
+                result, pings = asyncio.run(_run(url, make(args.users, args.courses), args.concurrency, args.duration))
+            label = f"{name} ({'async' if mode == '1' else 'sync'})"
+            print(f"{report(label, result)}   /ping p50 {median_ms(pings):.1f} ms "
+                  f"p99 {percentile(pings, 99) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Login latency under concurrent load, and what a login burst does to the rest of the app.
+
+Seeds users whose passwords are hashed with the app's own argon2 parameters, serves them from one
+uvicorn worker and posts ``/auth/login`` from ``--concurrency`` clients at once. Meanwhile
+``--bystanders`` clients page through the catalog (a DB-bound endpoint) and another samples ``/ping``;
+both are also measured without logins for reference. Logins the hash pool turns away are counted
+as 429, not as latencies.
+
+    python bench/login.py [--concurrency 4,16,64] [--bystanders 4] [--duration 10] [--users 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from _common import HEADERS, ROOT, bench_env, load, median_ms, percentile, report, seed, serve  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+async def _pings(url: str, stop: asyncio.Event) -> list[float]:
+    samples = []
+    async with httpx.AsyncClient(base_url=url, headers=HEADERS) as client:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await client.get("/ping")
+            samples.append(time.perf_counter() - started)
+            await asyncio.sleep(0.02)
+    return samples
+
+
+def _catalog(users: int):
+    async def page(client: httpx.AsyncClient, n: int):
+        return await client.get(f"/course/{n % users + 1}", params={"limit": 20})
+    return page
+
+
+async def _burst(url: str, users: int, concurrency: int, bystanders: int, duration: float):
+    async def login(client: httpx.AsyncClient, n: int):
+        return await client.post("/auth/login", json={"email": f"user{n % users + 1}@bench.local",
+                                                      "password": PASSWORD})
+
+    stop = asyncio.Event()
+    pinger = asyncio.create_task(_pings(url, stop))
+    catalog = asyncio.create_task(load(url, _catalog(users), concurrency=bystanders, duration=duration))
+    logins = await load(url, login, concurrency=concurrency, duration=duration) if concurrency else None
+    result = await catalog
+    stop.set()
+    return logins, result, await pinger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="4,16,64")
+    parser.add_argument("--bystanders", type=int, default=4, help="catalog clients during the burst")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    env = bench_env()
+    os.environ.update({k: env[k] for k in ("JWT_KEYS", "LEGACY_AUTH_TOKEN")})
+    sys.path.insert(0, str(ROOT))
+    from app.util.security import HASH_QUEUE_SIZE, HASH_WORKERS, hash_password
+
+    seed(env["DATABASE_URL"], courses=100, users=args.users, password_hash=hash_password(PASSWORD))
+    print(f"hash pool: {HASH_WORKERS} workers + {HASH_QUEUE_SIZE} queued; {args.bystanders} catalog clients")
+    with serve(env) as url:
+        for concurrency in [0, *map(int, args.concurrency.split(","))]:
+            logins, catalog, pings = asyncio.run(_burst(url, args.users, concurrency, args.bystanders, args.duration))
+            if logins is not None:
+                print(report(f"login x{concurrency}", logins))
+            print(f"{report('  catalog alongside', catalog)}   "
+                  f"/ping p50 {median_ms(pings):.1f} ms p99 {percentile(pings, 99) * 1000:.1f} ms")
+            failed = {code: n for code, n in catalog.statuses.items() if code != 200}
+            if failed:
+                sys.exit(f"catalog requests failed during the login burst: {failed}")
+
+
+if __name__ == "__main__":
+    main()
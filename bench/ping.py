@@ -0,0 +1,100 @@
+"""Requests/second through the auth middleware: the old BaseHTTPMiddleware version against the pure ASGI one.
+
+Both wrap the same one-route app and are driven straight through ASGI (no sockets, no client), so the
+numbers are the middleware's own per-request cost. The old middleware checked the token on every path,
+``/ping`` included; the pure ASGI one lets ``/ping`` through its allow-list, so ``/private`` is also
+measured to compare the token check itself.
+
+    python bench/ping.py [--requests 20000] [--rounds 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("JWT_KEYS", "bench:bench-secret")
+os.environ.setdefault("LEGACY_AUTH_TOKEN", "bench-token")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from app.middleware import verify_middleware  # noqa: E402
+from app.middleware.verify_middleware import VerifyTokenMiddleware  # noqa: E402
+from app.util.security import verify_access_token  # noqa: E402
+
+
+class BaseHTTPVerifyTokenMiddleware(BaseHTTPMiddleware):
+    """The middleware as it was before the pure ASGI rewrite."""
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
+        token = request.headers.get("Auth-token")
+        if not token:
+            scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+            token = credentials if scheme.lower() == "bearer" else None
+        claims = verify_access_token(token)
+        if claims:
+            request.state.user_id = int(claims["sub"])
+        elif not (verify_middleware.LEGACY_TOKEN and token == verify_middleware.LEGACY_TOKEN):
+            return JSONResponse(status_code=403, content={"detail": "Invalid token"})
+        return await call_next(request)
+
+
+def build(middleware) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ping": "pong!"}
+
+    @app.get("/private")
+    async def private():
+        return {"ping": "pong!"}
+
+    return app
+
+
+async def drive(app, path: str, requests: int) -> float:
+    """Sequential GETs straight into the ASGI app; returns requests/second."""
+    headers = [(b"host", b"bench"), (b"auth-token", verify_middleware.LEGACY_TOKEN.encode())]
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"{path} answered {message['status']}")
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+                 "headers": headers, "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+        await app(scope, receive, send)
+    return requests / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = {
+        "BaseHTTPMiddleware": build(BaseHTTPVerifyTokenMiddleware),
+        "pure ASGI": build(VerifyTokenMiddleware),
+    }
+    print(f"{args.requests} sequential requests per round, best of {args.rounds} rounds")
+    for path in ("/ping", "/private"):
+        for name, app in variants.items():
+            await drive(app, path, 500)  # warm-up
+            best = max([await drive(app, path, args.requests) for _ in range(args.rounds)])
+            print(f"{path:<10} {name:<20} {best:10.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
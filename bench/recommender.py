@@ -0,0 +1,66 @@
+"""Recommender rebuild time at 1M progress rows, and the cost of one recommendation from the built model.
+
+Seeds ``--users`` x ``--progress-per-user`` progress rows over ``--courses`` tagged courses, then runs
+the rebuild's two stages in-process, as the background job does: reading the training data through
+the ORM session and building the top-K neighbour lists. Request-time scoring is timed on the built
+model for a sample of users (history read from the database, merge of their neighbour lists).
+
+    python bench/recommender.py [--courses 10000] [--users 50000] [--progress-per-user 20] [--rounds 3]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from _common import bench_env, percentile, seed  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--progress-per-user", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    env = bench_env()
+    started = time.perf_counter()
+    seed(env["DATABASE_URL"], courses=args.courses, users=args.users, progress_per_user=args.progress_per_user)
+    print(f"seeded in {time.perf_counter() - started:.1f}s")
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.service import recommendation_service as rs
+
+    engine = create_engine(env["DATABASE_URL"])
+    loads, builds = [], []
+    for _ in range(args.rounds):
+        with Session(engine) as db:
+            started = time.perf_counter()
+            data = rs._load_training_data(db)
+            loads.append(time.perf_counter() - started)
+        model = rs._build_model(data)
+        builds.append(model.build_seconds)
+    print(f"{len(model.course_ids)} courses, {model.interactions} interactions, "
+          f"{int((model.neighbors >= 0).sum())} neighbour slots filled (k={rs.NEIGHBORS_K})")
+    print(f"load training data   median {statistics.median(loads):6.2f}s   max {max(loads):6.2f}s")
+    print(f"build model          median {statistics.median(builds):6.2f}s   max {max(builds):6.2f}s")
+    print(f"rebuild total        median {statistics.median(l + b for l, b in zip(loads, builds)):6.2f}s")
+
+    latencies = []
+    with Session(engine) as db:
+        for user_id in range(1, args.users + 1, max(1, args.users // 1000)):
+            started = time.perf_counter()
+            progress, watchlist = rs._user_history(user_id, db)
+            rs._recommend(model, progress, watchlist, 10)
+            latencies.append((time.perf_counter() - started) * 1000)
+    print(f"recommend (10)       p50 {percentile(latencies, 50):6.2f} ms   p99 {percentile(latencies, 99):6.2f} ms   "
+          f"over {len(latencies)} users")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Latency of ``GET /course/search`` at 100k courses, for terms from rare to matching most of the catalog.
+
+The catalog comes from ``seed_text_catalog``: the commonest word matches about a third of it and
+the rare ones a few dozen courses. Each query runs back to back from ``--concurrency`` clients for
+``--duration`` seconds against one uvicorn worker; the number of matching courses is shown next to
+the latencies.
+
+    python bench/search.py [--courses 100000] [--duration 5] [--concurrency 1]
+
+Run it with SEARCH_CANDIDATES=0 to see what ranking every match costs.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from _common import bench_env, load, percentile, seed_text_catalog, serve  # noqa: E402
+
+# Query templates over the words at these vocabulary ranks: rank 0 is in about a third of the courses,
+# rank 5000 in a few dozen; "topic" is in every description
+QUERIES = {
+    "broad term": ("{0}", (0,)),
+    "broad prefix": ("{0:.3}", (0,)),
+    "two broad terms": ("{0} {1}", (0, 1)),
+    "medium term": ("{0}", (100,)),
+    "rare term": ("{0}", (5000,)),
+    "rare prefix": ("{0:.4}", (5000,)),
+    "everything": ("topic", ()),
+}
+
+
+def _prepare(env: dict[str, str], courses: int) -> tuple[dict[str, str], dict[str, int]]:
+    """Seed the catalog; returns the queries and how many courses each matches."""
+    vocabulary = seed_text_catalog(env, courses=courses)
+    from sqlalchemy import create_engine, text
+
+    from app.service import search_service
+
+    queries = {name: template.format(*(vocabulary[r] for r in ranks)) for name, (template, ranks) in QUERIES.items()}
+    engine = create_engine(env["DATABASE_URL"])
+    with engine.connect() as conn:
+        matches = {
+            name: conn.execute(text("SELECT count(*) FROM course_search WHERE course_search MATCH :q"),
+                               {"q": search_service._match_query(q, "sqlite", prefix=True)}).scalar_one()
+            for name, q in queries.items()
+        }
+    engine.dispose()
+    return queries, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=100_000)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    env = bench_env()
+    queries, matches = _prepare(env, args.courses)
+    candidates = env.get("SEARCH_CANDIDATES", "2000 (default)")
+    print(f"{args.courses} courses, SEARCH_CANDIDATES={candidates}, {args.concurrency} client(s), "
+          f"{args.duration:g}s per query, 1 worker")
+    with serve(env) as url:
+        for name, q in queries.items():
+            async def search(client, n, q=q):
+                return await client.get("/course/search", params={"q": q, "limit": 20})
+
+            result = asyncio.run(load(url, search, concurrency=args.concurrency, duration=args.duration))
+            ms = [v * 1000 for v in result.latencies]
+            print(f"{name:<16} {q!r:<14} ~{matches[name]:>6} matches   p50 {percentile(ms, 50):6.1f} ms   "
+                  f"p95 {percentile(ms, 95):6.1f} ms   p99 {percentile(ms, 99):6.1f} ms   "
+                  f"statuses {dict(sorted(result.statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()